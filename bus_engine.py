@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+#
+# Run measurement tasks on several buses at the same time.
+#
+# Every bus (Prologix adapter, USBTMC device, ...) gets one worker
+# thread, and tasks addressed to devices on that bus are run by it,
+# in the order they were submitted.  Tasks on different buses run
+# concurrently, so a procedure spread over two adapters takes as
+# long as the slowest bus, rather than the sum.
+#
+# Usage is:
+#	e = bus_engine.engine()
+#	a = e.submit(dvm, dvm.measure)
+#	b = e.submit(psu, psu.vset, 1, 5.0)
+#	print(a.wait())
+#	e.join()
+#
+
+from __future__ import print_function
+
+import sys
+import threading
+
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+
+class task(object):
+
+	def __init__(self, dev, func, args, kwargs):
+		self.dev = dev
+		self.func = func
+		self.args = args
+		self.kwargs = kwargs
+		self.result = None
+		self.exc = None
+		self.done = threading.Event()
+
+	def run(self):
+		try:
+			self.result = self.func(*self.args, **self.kwargs)
+		except:
+			self.exc = sys.exc_info()
+		self.done.set()
+
+	###############################################################
+	# Wait for the task, and return its result or raise its exception
+	def wait(self, tmo=None):
+		if tmo is not None:
+			tmo *= 1e-3
+		if not self.done.wait(tmo):
+			raise RuntimeError("Timeout waiting for task")
+		if self.exc is not None:
+			raise self.exc[1]
+		return self.result
+
+class worker(threading.Thread):
+
+	def __init__(self, bus):
+		threading.Thread.__init__(self)
+		self.daemon = True
+		self.bus = bus
+		self.q = queue.Queue()
+
+	def run(self):
+		while True:
+			t = self.q.get()
+			if t is None:
+				break
+			t.run()
+
+class engine(object):
+
+	def __init__(self):
+		self.workers = dict()
+		self.tasks = list()
+
+	###############################################################
+	# Queue func(*args, **kwargs) for the bus dev is on.
+	def submit(self, dev, func, *args, **kwargs):
+		b = dev.bus()
+		w = self.workers.get(b)
+		if w is None:
+			w = worker(b)
+			w.start()
+			self.workers[b] = w
+		t = task(dev, func, args, kwargs)
+		self.tasks.append(t)
+		w.q.put(t)
+		return t
+
+	###############################################################
+	# Wait for all submitted tasks, return their results in the
+	# order they were submitted.  If any failed, the first failure
+	# is raised once they have all finished.
+	def join(self):
+		l = self.tasks
+		self.tasks = list()
+		for t in l:
+			t.done.wait()
+		for t in l:
+			if t.exc is not None:
+				raise t.exc[1]
+		return [t.result for t in l]
+
+	###############################################################
+	# Submit a list of (dev, func, args...) and join them
+	def run(self, tl):
+		for i in tl:
+			self.submit(i[0], i[1], *i[2:])
+		return self.join()
+
+	def close(self):
+		for w in self.workers.values():
+			w.q.put(None)
+		for w in self.workers.values():
+			w.join()
+		self.workers = dict()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+#
+# Instrument to instrument calibration loop
+#
+# Many calibrations are a list of steps where the DUT is put in some
+# state, a DVM reads the output, and the reading is sent back to the
+# DUT.  This runs such a list of steps from a table, where each step
+# is a dict with (all optional):
+#
+#	"n"	label for the log
+#	"dvm"	DVM configuration for this step, a tuple of commands or
+#		a function, the commands from the first one which
+#		differs from the previous step's on are sent
+#	"call"	function to call before the step (cable prompts...)
+#	"dut"	DUT command to put it in the state to be read
+#	"read"	False if the step takes no reading
+#	"check"	function which must return True for the reading
+#	"submit" DUT command sending the readings taken since the last
+#		submit, either a format string or a function taking
+#		the list of readings and returning the command
+#	"tmo"	timeout in ms for the DUT to finish the submit
+#
+# dut_cmd(cmd, tmo) must send the command and return once the DUT
+# reports ready, the DVM is triggered immediately after that.
+#
+# Each step is logged with the time spent reading and the time the
+# DUT spent on its commands, so slow steps can be found.
+#
+# Usage is:
+#	l = cal_loop.loop(dvm_rd, dut_cmd, dvm_cmd)
+#	l.run([
+#		{"n": 1, "dvm": ("DCV",), "submit": "CAL VALUE %.9f"},
+#		{"n": 2, "dvm": ("DCV", "RANGE 100"), "submit": "CAL VALUE %.9f"},
+#	])
+#
+
+from __future__ import print_function
+
+import sys
+import time
+
+import pylt
+
+class loop(object):
+
+	def __init__(self, dvm_read, dut_cmd, dvm_cmd=None, fname=None,
+	    f=sys.stdout):
+		self.dvm_read = dvm_read
+		self.dut_cmd = dut_cmd
+		self.dvm_cmd = dvm_cmd
+		self.fname = fname
+		self.f = f
+		self.dvm_cfg = None
+		self.log = list()
+
+	def dvm_config(self, c):
+		if c == self.dvm_cfg:
+			return
+		if callable(c):
+			c()
+		else:
+			# Skip the commands the two have in common at the
+			# start, everything after the first difference is
+			# sent, as a function change (DCV to DCI...) resets
+			# the range and other settings following it.
+			o = self.dvm_cfg
+			if o is None or callable(o):
+				o = ()
+			j = 0
+			while j < min(len(c), len(o)) and c[j] == o[j]:
+				j += 1
+			for i in c[j:]:
+				self.dvm_cmd(i)
+		self.dvm_cfg = c
+
+	def line(self, r):
+		if r["reading"] is None:
+			s = "%4s %15s" % (str(r["n"]), "")
+		else:
+			s = "%4s %15.9f" % (str(r["n"]), r["reading"])
+		s += "  dvm %6.2fs  dut %6.2fs" % (r["t_dvm"], r["t_dut"])
+		self.f.write(s + "\n")
+		self.f.flush()
+		if self.fo is not None:
+			self.fo.write(s + "\n")
+			self.fo.flush()
+
+	def step(self, s, vals):
+		r = {"n": s.get("n"), "reading": None, "t_dvm": 0., "t_dut": 0.}
+		if "dvm" in s:
+			self.dvm_config(s["dvm"])
+		if "call" in s:
+			s["call"]()
+		t0 = time.time()
+		if "dut" in s:
+			self.dut_cmd(s["dut"], s.get("tmo", 10000))
+		t1 = time.time()
+		if s.get("read", True):
+			a = self.dvm_read()
+			r["reading"] = a
+			vals.append(a)
+			if "check" in s and not s["check"](a):
+				raise pylt.PyltError("cal_loop",
+				    "Step %s: reading %g failed check" %
+				    (str(s.get("n")), a))
+		t2 = time.time()
+		if "submit" in s:
+			x = s["submit"]
+			if callable(x):
+				x = x(vals)
+			else:
+				x = x % tuple(vals)
+			self.dut_cmd(x, s.get("tmo", 10000))
+			del vals[:]
+		t3 = time.time()
+		r["t_dvm"] = t2 - t1
+		r["t_dut"] = (t1 - t0) + (t3 - t2)
+		return r
+
+	###############################################################
+	# Run the steps, return the log of them
+	def run(self, steps):
+		self.fo = None
+		if self.fname is not None:
+			self.fo = open(self.fname, "a")
+		vals = list()
+		l = list()
+		t0 = time.time()
+		try:
+			for s in steps:
+				r = self.step(s, vals)
+				self.line(r)
+				l.append(r)
+		finally:
+			if self.fo is not None:
+				self.fo.close()
+			self.fo = None
+			self.log += l
+		self.f.write("# %d steps in %.1fs\n" % (len(l), time.time() - t0))
+		return l
+
+	###############################################################
+	# The n steps which took longest so far
+	def slowest(self, n=5):
+		return sorted(self.log,
+		    key=lambda r: -(r["t_dvm"] + r["t_dut"]))[:n]
@@ -1,36 +1,175 @@
+import datetime
+
+import numpy
 import matplotlib.pyplot  as plt
 import matplotlib.dates as mdates
 
-def plot_readings(readings, low_clip=None, xlabel="", ylabel="", data_label=""):
+# matplotlib date number of the unix epoch
+epoch_num = mdates.date2num(datetime.datetime(1970, 1, 1))
 
-    dates = []
-    values = []
-    datemin = 1e99
-    datemax = -1e99
-    for z in readings:
-        date = mdates.date2num(z[0])
-        if low_clip != None:
-            if z[1] > low_clip:
-                dates.append(date)
-                values.append(z[1])
-                
-        else:
-            dates.append(date)
-            values.append(z[1])
-        datemin = min(datemin, date)
-        datemax = max(datemax, date)
-    fig, ax = plt.subplots()
-    ax.plot_date(dates, values, 'k-', label=data_label)
+###############################################################
+# Min/max envelope decimation: split the readings into n buckets
+# and keep the smallest and largest reading of each, in time order,
+# so peaks and dips survive any amount of decimation.
+def decimate(t, v, n):
+    t = numpy.asarray(t)
+    v = numpy.asarray(v)
+    if len(t) <= 2 * n:
+        return t, v
+    e = numpy.linspace(0, len(t), n + 1).astype(numpy.int64)[:-1]
+    imin = numpy.minimum.reduceat(v, e)
+    imax = numpy.maximum.reduceat(v, e)
+    # Position of min and max within each bucket
+    b = numpy.repeat(numpy.arange(n), numpy.diff(numpy.append(e, len(t))))
+    amin = numpy.flatnonzero(v == imin[b])
+    amax = numpy.flatnonzero(v == imax[b])
+    kmin = numpy.unique(b[amin], return_index=True)[1]
+    kmax = numpy.unique(b[amax], return_index=True)[1]
+    i = numpy.sort(numpy.concatenate((amin[kmin], amax[kmax])))
+    return t[i], v[i]
 
-#    plt.ticklabel_format(axis='y', useOffset=False)
+def _axes(ax, fig, xlabel, ylabel, datemin, datemax):
     ax.set_xlabel(xlabel)
-    ax.xaxis.set_major_locator(mdates.HourLocator())
+    ax.xaxis.set_major_locator(mdates.AutoDateLocator())
     ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-    ax.xaxis.set_minor_locator(mdates.MinuteLocator())
     ax.set_ylabel(ylabel)
-    ax.set_xlim(datemin, datemax)
+    if datemax > datemin:
+        ax.set_xlim(datemin, datemax)
     ax.format_xdata = mdates.DateFormatter('%H:%M')
-#    plt.legend(fontsize='x-small')
     ax.grid(True)
     fig.autofmt_xdate()
-    plt.show()
+
+def _width(fig):
+    return int(fig.get_size_inches()[0] * fig.dpi)
+
+###############################################################
+# Plot arrays of timestamps (seconds since the epoch) and values,
+# decimated to the width of the figure in pixels.
+def plot_arrays(t, v, low_clip=None, xlabel="", ylabel="", data_label="",
+    show=True):
+    t = numpy.asarray(t, dtype=numpy.float64)
+    v = numpy.asarray(v, dtype=numpy.float64)
+    if low_clip != None:
+        m = v > low_clip
+        t = t[m]
+        v = v[m]
+    fig, ax = plt.subplots()
+    td, vd = decimate(t, v, _width(fig))
+    d = td / 86400. + epoch_num
+    ax.plot(d, vd, 'k-', label=data_label)
+    if len(d) > 0:
+        _axes(ax, fig, xlabel, ylabel, d[0], d[-1])
+    if show:
+        plt.show()
+    return fig, ax
+
+###############################################################
+# Plot (part of) a readings_store, without reading all of it
+def plot_store(fname, t0=None, t1=None, column="v", **kw):
+    import readings_store
+    x = readings_store.store(fname).between(t0, t1)
+    return plot_arrays(x["t"], x[column], **kw)
+
+def plot_readings(readings, low_clip=None, xlabel="", ylabel="", data_label=""):
+    dates = mdates.date2num([z[0] for z in readings])
+    values = numpy.array([z[1] for z in readings], dtype=numpy.float64)
+    t = (dates - epoch_num) * 86400.
+    plot_arrays(t, values, low_clip, xlabel, ylabel, data_label)
+
+###############################################################
+# Min/max of each run of k readings, in time order; len(t) must be
+# a multiple of k.
+def _envelope(t, v, k):
+    if k == 1:
+        return t, v
+    nb = len(t) // k
+    w = v.reshape(nb, k)
+    i0 = numpy.argmin(w, axis=1)
+    i1 = numpy.argmax(w, axis=1)
+    b = numpy.arange(nb) * k
+    i = numpy.column_stack((b + numpy.minimum(i0, i1),
+        b + numpy.maximum(i0, i1))).ravel()
+    return t[i], v[i]
+
+###############################################################
+# A plot which follows an acquisition while it runs.
+#
+# Either give it a readings_store to watch, or feed it arrays with
+# update(t, v).  Only the readings which are new since the last
+# update are decimated, into buckets of k readings, and when the
+# decimated points get too many for the screen they are decimated
+# again and k grows, so each update costs the same however long the
+# log gets.
+#
+# Usage is:
+#	p = data_plotter.live_plot(store="_.log")
+#	while True:
+#		p.update()
+#		time.sleep(1)
+#
+class live_plot(object):
+
+    def __init__(self, store=None, column="v", xlabel="", ylabel="",
+        data_label=""):
+        self.column = column
+        self.store = None
+        if store is not None:
+            import readings_store
+            self.store = readings_store.store(store)
+        # Readings taken in so far, and per bucket
+        self.rows = 0
+        self.k = 1
+        # Decimated complete buckets, and the readings of the last
+        # incomplete one
+        self.td = numpy.zeros(0)
+        self.vd = numpy.zeros(0)
+        self.tt = numpy.zeros(0)
+        self.vt = numpy.zeros(0)
+        plt.ion()
+        self.fig, self.ax = plt.subplots()
+        self.line, = self.ax.plot([], [], 'k-', label=data_label)
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+
+    # The readings added since the last update
+    def new_data(self):
+        # The acquisition appends behind our back
+        self.store.reload()
+        n = len(self.store)
+        x = self.store.data()
+        t = numpy.asarray(x["t"][self.rows:n], dtype=numpy.float64)
+        v = numpy.asarray(x[self.column][self.rows:n], dtype=numpy.float64)
+        return t, v
+
+    def add(self, t, v):
+        self.rows += len(t)
+        t = numpy.concatenate((self.tt, t))
+        v = numpy.concatenate((self.vt, v))
+        n = len(t) - len(t) % self.k
+        td, vd = _envelope(t[:n], v[:n], self.k)
+        self.td = numpy.concatenate((self.td, td))
+        self.vd = numpy.concatenate((self.vd, vd))
+        self.tt = t[n:]
+        self.vt = v[n:]
+        w = _width(self.fig)
+        if len(self.td) > 8 * w:
+            self.td, self.vd = decimate(self.td, self.vd, w)
+            self.k = max(self.k, self.rows // w)
+
+    def update(self, t=None, v=None):
+        if t is not None:
+            self.add(numpy.asarray(t, dtype=numpy.float64),
+                numpy.asarray(v, dtype=numpy.float64))
+        if self.store is not None:
+            self.add(*self.new_data())
+        td = numpy.concatenate((self.td, self.tt))
+        vd = numpy.concatenate((self.vd, self.vt))
+        if len(td) == 0:
+            return
+        d = td / 86400. + epoch_num
+        self.line.set_data(d, vd)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        _axes(self.ax, self.fig, self.xlabel, self.ylabel, d[0], d[-1])
+        self.fig.canvas.draw_idle()
+        plt.pause(0.001)
@@ -3,16 +3,18 @@
 # This program collects data on the frequency/amplitude flatness
 # of a HP3336C Level Generator relative to a U2004 Power Sensor
 #
+# If interrupted, run it again and it will continue where it stopped,
+# remove "_.ckpt" to start over.
+#
 
 import u2004a
 import hp3336c
-import time
+import sweep
 
 g=hp3336c.hp3336c()
 
 m=u2004a.u2004a()
 
-
 # The amplitude range we want to sweep
 amp_lo=	-30.0
 amp_hi=	+7.0
@@ -23,43 +25,38 @@ freq_lo = 9e3
 freq_hi = 21e6
 freq_step = 2.0
 
-# The file we dump data to, in addition to stdout
-f = open("_", "w")
-
-# Sweep amplitude
-amp = amp_lo
-while amp < amp_hi:
-
-	# Set the generator amplitude and let it settle for 10 seconds
-	g.set_dbm(amp)
-	time.sleep(10)
-
-	
-	# Sweep frequency
-	freq = freq_lo
-	while freq < freq_hi:
-
-		# Set generator frequency
-		g.set_freq(freq)
-
-		# Tell the power sensor what to expect
-		m.config(freq, amp, 4)
-
-		# Settle for a second
-		time.sleep(1)
-
-		# Do measurement (can take up to 35-40 sec)
-		x = m.measure()
-
-		# Write result to data file
-		f.write("%e %e %e %e\n" % (freq, amp, x, x-amp))
-		f.flush()
-		print("%12.1f %7.3f %7.3f %7.3f" % (freq, amp, x, x-amp))
-
-		freq *= freq_step
-
-	f.write("\n")
-
-	amp += amp_step
-
-f.close()
+# setup() runs in the background while the previous result is
+# fetched from the power sensor, so it only notes the point ...
+cur = dict()
+def setup(p):
+	cur.update(p)
+
+# ... and measure() tells the power sensor what to expect, then
+# measures (can take up to 35-40 sec) with the generator settled.
+def measure():
+	m.config(cur["freq"], cur["amp"], 4)
+	m.trigger()
+	m.wait_done()
+
+# Reading the result back overlaps with setting the next point
+def fetch(x):
+	return m.fetch()
+
+def fmt(p, x):
+	return "%e %e %e %e" % (p["freq"], p["amp"], x, x - p["amp"])
+
+s = sweep.sweep([
+	# Let the generator amplitude settle for 10 seconds
+	sweep.axis("amp", sweep.linstep(amp_lo, amp_hi, amp_step),
+	    g.set_dbm, 10),
+	# and the frequency for a second
+	sweep.axis("freq", sweep.logstep(freq_lo, freq_hi, freq_step),
+	    g.set_freq, 1),
+    ],
+    measure, fetch=fetch, setup=setup,
+    # The file we dump data to, in addition to stdout
+    fname="_", checkpoint="_.ckpt", fmt=fmt)
+
+for p,x in s.run():
+	print("%12.1f %7.3f %7.3f %7.3f" %
+	    (p["freq"], p["amp"], x, x - p["amp"]))
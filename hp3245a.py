@@ -12,6 +12,7 @@ class hp3245a(prologix_usb.gpib_dev):
 		prologix_usb.gpib_dev.__init__(self, name, adr)
 		self.spoll_cmd = 0x10
 		self.spoll_data = 0x80
+		self.spoll_err = 0x20
 		self.attr("read_tmo_ms", 2000)
 		self.attr("rd_mode", "eoi")
 		self.wr("END ALWAYS")
@@ -1,9 +1,12 @@
 
 from __future__ import print_function
 
+import json
 import sys
 import time
 
+import pylt
+import cal_loop
 import hp3458a
 import hp3245a
 
@@ -25,6 +28,10 @@ class hp3245service(object):
 
 		self.fo = None
 		self.cable = None
+		self.dvm_cfg = None
+		self.dut_dirty = True
+		self.nplc = None
+		self.adaptive = True
 
 	def prompt(self, txt):
 		print(txt)
@@ -51,7 +58,7 @@ class hp3245service(object):
 		for i in c:
 			self.dut.wr(i)
 			self.dut.wait_cmd(tmo)
-			self.dvm.AOK()
+			self.dut.AOK()
 
 	def dut_rst(self):
 		self.dut_cmds(["RESET %d" % self.chan, "USE %d" % self.chan])
@@ -59,8 +66,35 @@ class hp3245service(object):
 	def dvm_rst(self):
 		self.dvm.reset()
 		self.dvm_cmds(["NPLC 100", "NDIG 8"])
+		self.nplc = 100
+
+	###############################################################
+	# Read for a pass/fail test against [lo, hi], starting with a
+	# short integration and only going on to longer ones if the
+	# reading is within noise of a limit.  The final NPLC 100
+	# reading is always taken as is.
+	# Returns (reading, nplc)
+	def adaptive_rd(self, func, lo, hi):
+		for nplc,rel,floor in nplc_noise[func]:
+			if self.nplc != nplc:
+				self.dvm_cmds(["NPLC %d" % nplc])
+				self.nplc = nplc
+			a = self.dvm_rd1()
+			n = rel * max(abs(lo), abs(hi), abs(a)) + floor
+			m = min(abs(a - lo), abs(a - hi))
+			if m > decisive * n:
+				return a, nplc
+		return self.dvm_rd(), 100
+
+	def dvm_rd1(self):
+		self.dvm.wr("T")
+		self.dvm.wait_data(tmo=25000)
+		return float(self.dvm.rd())
 
 	def dvm_rd(self):
+		if self.nplc != 100:
+			self.dvm_cmds(["NPLC 100"])
+			self.nplc = 100
 		t0 = time.time()
 		self.dvm.wr("T")
 		self.dvm.wait_data(tmo=25000)
@@ -70,44 +104,41 @@ class hp3245service(object):
 			print("DT", t1 - t0)
 		return float(a)
 
+	###############################################################
+	# The calibration steps, see cal_loop.py.  The DVM range and
+	# function changes, and the cable change, are part of the table.
+	def cal_steps(self):
+		l = list()
+		def step(n, dvm, **kw):
+			x = {"n": n, "dvm": dvm, "submit": "CAL VALUE %.9f"}
+			x.update(kw)
+			l.append(x)
+		for i in range(1, 45):
+			step(i, ("DCV", "RANGE AUTO"))
+		step(45, ("DCV", "RANGE 100"))
+		for i in (46, 47):
+			step(i, ("DCV", "RANGE AUTO"))
+		for i in range(48, 71):
+			step(i, ("DCI", "RANGE AUTO"), call=self.cable_current)
+		step(72, ("DCI", "RANGE AUTO"), tmo=60000)
+		return l
+
 	def calibrate(self, calcode=3245):
 
 		self.dut_rst()
-		self.dvm.reset()
-		self.dvm_cmds(["NPLC 100", "NDIG 8"])
+		self.dvm_rst()
 		self.cable_voltage()
 
 		self.dut_cmds(["CAL %d" % calcode])
 
-		for i in range(1,45):
-			a = self.dvm_rd()
-			print("%2d" % i, "%13.9f" % a)
-			self.dut_cmds(["CAL VALUE %.9f" % a])
-
-		i = 45
-		self.dvm_cmds(["RANGE 100"])
-		a = self.dvm_rd()
-		print("%2d" % i, "%13.9f" % a)
-		self.dut_cmds(["CAL VALUE %.9f" % a])
-
-		self.dvm_cmds(["RANGE AUTO"])
-		for i in (46, 47):
-			a = self.dvm_rd()
-			print("%2d" % i, "%13.9f" % a)
-			self.dut_cmds(["CAL VALUE %.9f" % a])
-
-		self.dvm_cmds(["DCI"])
-
-		self.cable_current()
-
-		for i in range(48, 71):
-			a = self.dvm_rd()
-			print("%2d" % i, "%13.9f" % a)
-			self.dut_cmds(["CAL VALUE %.9f" % a])
-		i = 72
-		a = self.dvm_rd()
-		print("%2d" % i, "%13.9f" % a)
-		self.dut_cmds(["CAL VALUE %.9f" % a], tmo=60000)
+		l = cal_loop.loop(self.dvm_rd,
+		    lambda c,tmo: self.dut_cmds([c], tmo=tmo),
+		    lambda c: self.dvm_cmds([c]),
+		    fname="_hp3245_calibrate_%d.log" % self.chan)
+		l.run(self.cal_steps())
+		for r in l.slowest():
+			print("Slow step %4s: dvm %.2fs dut %.2fs" %
+			    (str(r["n"]), r["t_dvm"], r["t_dut"]))
 
 	def hdr(self, txt):
 		print()
@@ -117,201 +148,353 @@ class hp3245service(object):
 			self.fo.write("\n" + txt + "\n")
 			self.fo.write("-" * len(txt) + "\n")
 
-	def one_test(self, lo, target, hi, unit, cmds=None):
-		if not cmds is None:
-			self.dut_cmds(cmds)
-		s = ""
-		a = self.dvm_rd()
-		if a < lo or a > hi:
-			t = "FAIL"
-		else:
-			t = "PASS"
-	        s += "[%13.9f" % lo
-
-		if target is None:
-			r = "     "
+	def line(self, r):
+		s = "[%13.9f" % r["lo"]
+		if r["target"] is None:
 			s += "%13s" % ""
 		else:
-			r = "%5.1f%%" % (100.0 * (a - target) / (hi - lo))
-			s += " %13.9f" % target
-
-	        s += " %13.9f]" % hi
-
-	        s += " %13.9f" % a
-
-		s += " %-3s" % unit
-
-		s += " " + r
-		s += " " + t
-		
+			s += " %13.9f" % r["target"]
+		s += " %13.9f]" % r["hi"]
+		s += " %13.9f" % r["reading"]
+		s += " %-3s" % r["unit"]
+		if r["pct"] is None:
+			s += " " + "     "
+		else:
+			s += " " + "%5.1f%%" % r["pct"]
+		s += " " + r["result"]
 		print(s)
 		if not self.fo is None:
 			self.fo.write(s + "\n")
 
-	def sym_test(self, target, band, unit, cmds=None):
-		self.one_test(target - band, target, target + band, unit, cmds)
-
-	def asym_test(self, app, target, band, unit, goal=None):
-		if goal is None:
-			goal = target
-		self.one_test(goal - band, goal, goal + band, unit,
-		    cmds = ["APPLY " + app + " %.6f" % target])
-
-	def operational_verification(self):
-
-		self.fo = open(
-		    "_hp3245_operational_verification_%d.txt" % self.chan, "w")
-
-		if True:
-			self.op_ver_dcv()
-
-		if True:
-			self.op_ver_acv()
-
-		if True:
-			self.op_ver_offset()
-
-		if True:
-			self.op_ver_flatness()
-
-		self.cable_current()
-
-		if True:
-			self.op_ver_dci()
-
-		self.fo.close()
-		self.fo = None
-
-	def op_ver_dcv(self):
-		self.hdr("DCV Amplitude Accuracy - High Res")
-		self.dvm_rst()
-		self.dut_rst()
-		self.cable_voltage()
-
-		self.dut_cmds(["RANGE 1"])
-		self.asym_test("DCV",  1.25, 84e-6, "V")
-		self.asym_test("DCV",  0.00, 31e-6, "V")
-		self.asym_test("DCV", -1.25, 84e-6, "V")
-
-		self.dut_cmds(["RANGE 10"])
-		self.asym_test("DCV",  10.25, 570e-6, "V")
-		self.asym_test("DCV",   0.00, 180e-6, "V")
-		self.asym_test("DCV", -10.25, 570e-6, "V")
-
-		self.hdr("DCV Amplitude Accuracy - Low Res")
-		self.dut_rst()
-
-		self.dut_cmds(["DCRES LOW", "RANGE .15625"])
-		self.asym_test("DCV",  .15625, 1.00e-3, "V")
-		self.asym_test("DCV",  .00000,  .73e-3, "V")
-		self.asym_test("DCV", -.15625, 1.00e-3, "V")
-
-		self.dut_cmds(["RANGE 10"])
-		self.asym_test("DCV",  10.0, 54e-3, "V")
-		self.asym_test("DCV",   0.0, 37e-3, "V")
-		self.asym_test("DCV", -10.0, 54e-3, "V")
-
-		self.hdr("DCV Zero Ohm Output Resistance")
-		self.dut_rst()
-		self.dvm_cmds(["OHM"])
-
-		self.one_test(0, None, .5, "Ohm")
-
-	def op_ver_dci(self):
-		self.hdr("DCI Amplitude Accuracy - High Res")
-		self.dut_rst()
-		self.dvm_rst()
-		self.dvm_cmds(["DCI"])
-		self.cable_current()
-
-		self.dut_cmds(["RANGE 0.0001"])
-		self.asym_test("DCI",  .0001, 8.5e-9, "A")
-		self.asym_test("DCI",  .0000, 3.3e-9, "A")
-		self.asym_test("DCI", -.0001, 8.5e-9, "A")
-
-		self.dut_cmds(["RANGE 0.1"])
-		self.asym_test("DCI",  .1, 23.3e-6, "A")
-		self.asym_test("DCI",  .0,  3.3e-6, "A")
-		self.asym_test("DCI", -.1, 23.3e-6, "A")
-
-		self.hdr("DCI Amplitude Accuracy - Low Res")
-		self.dut_rst()
-		self.dut_cmds(["DCRES LOW", "RANGE 0.0001"])
-		self.asym_test("DCI",  .0001, 630e-9, "A")
-		self.asym_test("DCI",  .0000, 380e-9, "A")
-		self.asym_test("DCI", -.0001, 630e-9, "A")
-
-		self.dut_cmds(["RANGE 0.1"])
-		self.asym_test("DCI",  .1,  720e-6, "A")
-		self.asym_test("DCI",  .0,  400e-6, "A")
-		self.asym_test("DCI", -.1,  720e-6, "A")
-
-	def op_ver_acv(self):
-		self.dvm_cmds(["ACV", "ACBAND 1000"])
-		self.dut_rst()
-		self.dvm_rst()
-		self.dvm_cmds(["ACV"])
-		self.cable_voltage()
-
-		self.hdr("ACV Amplitude Accuracy - Sine Wave")
-		self.dut_cmds(["IMP 50", "APPLY ACV .15625", "RANGE .15625"])
-		self.asym_test("ACV",  .15625,  720e-6, "V", .11047)
-		self.asym_test("ACV",  .11719,  640e-6, "V", .08282)
-		self.asym_test("ACV",  .07813,  560e-6, "V", .05523)
-
-		self.dut_cmds(["ARANGE ON", "APPLY ACV 10", "RANGE 10"])
-		self.asym_test("ACV",  10.0,  46e-3, "V", 7.070)
-		self.asym_test("ACV",   7.5,  41e-3, "V", 5.303)
-		self.asym_test("ACV",   5.0,  36e-3, "V", 3.535)
-
-		self.dut_rst()
-		self.hdr("ACV Amplitude Accuracy - Square Wave")
-		self.dut_cmds(["IMP 50", "APPLY SQV .15625", "RANGE .15625"])
-		self.asym_test("SQV",  .15625,  1.27e-3, "V")
-		self.asym_test("SQV",  .11719,  1.15e-3, "V")
-		self.asym_test("SQV",  .07813,  1.04e-3, "V")
-
-		self.dut_cmds(["ARANGE ON", "APPLY SQV 10", "RANGE 10"])
-		self.asym_test("SQV",  10.0,  81e-3, "V")
-		self.asym_test("SQV",   7.5,  74e-3, "V")
-		self.asym_test("SQV",   5.0,  67e-3, "V")
-
-		self.dut_rst()
-
-
-	def op_ver_offset(self):
-		self.hdr("Offset Accuracy")
-		self.dut_rst()
-		self.dvm_rst()
-		self.cable_voltage()
-
-		self.dvm_cmds(["DCV"])
-		self.dut_cmds(["IMP 50", "APPLY ACV 5", "FREQ 600"])
-		self.dut_cmds(["DCOFF -2.5"])
-		self.asym_test("ACV",  5.0,  86.5e-3, "V", -5.0)
-		self.dut_cmds(["DCOFF 2.5"])
-		self.asym_test("ACV",  5.0,  86.5e-3, "V", +5.0)
-		self.dut_cmds(["DCOFF 0.0390625"])
-		self.asym_test("ACV",  .078125,  1.352e-3, "V", 0.078125)
-		self.dut_cmds(["DCOFF -0.0390625"])
-		self.asym_test("ACV",  .078125,  1.352e-3, "V", -0.078125)
-
-	def op_ver_flatness(self):
-		self.hdr("Flatness")
-		self.dut_rst()
-		self.dvm_rst()
-		self.cable_voltage()
-
-		self.dvm_cmds(["ACDCV"])
-		self.dut_cmds(["IMP 50", "APPLY ACV 10", "FREQ 1000"])
-		self.asym_test("ACV", 10.0, 54e-3, "V", 7.070)
-
-		self.dvm_cmds(["SMATH 9", "MATH DB"])
-		self.dut_cmds(["FREQ 10000"])
-		self.asym_test("ACV", 10.0, .07, "dB", 0.0)
-		self.dut_cmds(["FREQ 1000000"])
-		self.asym_test("ACV", 10.0, 2.0, "dB", 0.0)
-
+	def judge(self, lo, target, hi, unit, a):
+		r = {
+			"lo": lo,
+			"target": target,
+			"hi": hi,
+			"unit": unit,
+			"reading": a,
+			"pct": None,
+			"result": "PASS",
+		}
+		if a < lo or a > hi:
+			r["result"] = "FAIL"
+		if target is not None:
+			r["pct"] = 100.0 * (a - target) / (hi - lo)
+		return r
+
+	###############################################################
+	# Test-plan engine
+	#
+	# A plan is a list of blocks (see op_ver_plan below), each of
+	# which starts from a reset DUT and a given DVM configuration.
+	# Blocks are run grouped by cable and DVM configuration, so the
+	# operator is prompted once per cable and the DVM is only
+	# reconfigured when needed.  The DUT and DVM resets, which take
+	# a while, overlap.
+	#
+	# DC readings are taken with adaptive integration time (see
+	# adaptive_rd()), unless self.adaptive is False.
+	#
+	# The DUT commands cannot overlap a DVM integration, as they
+	# would change what is being measured, but each test's commands
+	# are sent back to back with a single error check.
+
+	def wait_all(self, devs, tmo=20000):
+		w = dict(devs)
+		te = time.time() + tmo * 1e-3
+		while len(w) > 0:
+			dt = (te - time.time()) * 1e3
+			r = pylt.wait_spoll_any(w, max(dt, 1))
+			if len(r) == 0:
+				raise pylt.PyltError("hp3245service",
+				    "Timeout waiting for reset")
+			for d in r:
+				del w[d]
+
+	def dut_batch(self, c, tmo=10000):
+		for i in c:
+			self.dut.wr(i)
+			self.dut.wait_cmd(tmo)
+			self.dut_dirty = True
+		self.dut.AOK()
+
+	def block_setup(self, b):
+		dvm = ["NPLC 100", "NDIG 8"] + list(b.get("dvm", []))
+		w = dict()
+		# The DUT resets while the DVM does
+		if self.dut_dirty:
+			self.dut.wr("RESET %d" % self.chan)
+			w[self.dut] = self.dut.spoll_cmd
+		if dvm != self.dvm_cfg:
+			self.dvm.reset()
+			self.dvm_cmds(dvm)
+			self.dvm_cfg = dvm
+			self.nplc = 100
+		self.wait_all(w)
+		if self.dut in w:
+			self.dut_batch(["USE %d" % self.chan])
+		self.dut_dirty = False
+		if b["cable"] == "voltage":
+			self.cable_voltage()
+		else:
+			self.cable_current()
+
+	###############################################################
+	# Steps are lists, tagged by their first element:
+	#	["dut", cmd, ...]	DUT commands
+	#	["dvm", cmd, ...]	DVM commands
+	#	["apply", func, target, band, unit(, goal)]
+	#				APPLY func target, expect goal +/- band
+	#	["limit", lo, target, hi, unit]
+	#				expect a reading in [lo, hi]
+	def run_block(self, b):
+		self.block_setup(b)
+		self.hdr(b["hdr"])
+		res = list()
+		for s in b["steps"]:
+			if s[0] == "dut":
+				self.dut_batch(s[1:])
+				continue
+			if s[0] == "dvm":
+				self.dvm_cmds(s[1:])
+				self.dvm_cfg = None
+				continue
+			if s[0] == "apply":
+				goal = s[2]
+				if len(s) > 5:
+					goal = s[5]
+				self.dut_batch(["APPLY " + s[1] + " %.6f" % s[2]])
+				lo = goal - s[3]
+				target = goal
+				hi = goal + s[3]
+				unit = s[4]
+			elif s[0] == "limit":
+				lo, target, hi, unit = s[1:5]
+			else:
+				raise pylt.PyltError("hp3245service",
+				    "Unknown step " + repr(s))
+			t0 = time.time()
+			func = None
+			if self.adaptive and self.dvm_cfg is not None:
+				func = self.dvm_cfg[-1]
+			if func in nplc_noise:
+				a,nplc = self.adaptive_rd(func, lo, hi)
+			else:
+				a,nplc = self.dvm_rd(), 100
+			r = self.judge(lo, target, hi, unit, a)
+			r["nplc"] = nplc
+			r["step"] = s
+			r["time"] = time.time() - t0
+			self.line(r)
+			res.append(r)
+		return {"hdr": b["hdr"], "name": b.get("name"), "tests": res}
+
+	def order(self, plan):
+		k = list()
+		for b in plan:
+			for x in (b["cable"], tuple(b.get("dvm", []))):
+				if x not in k:
+					k.append(x)
+		return sorted(plan, key=lambda b: (k.index(b["cable"]),
+		    k.index(tuple(b.get("dvm", [])))))
+
+	###############################################################
+	# Run a plan, which may be a file name of a JSON plan, and write
+	# the text report and a JSON report with the same basename.
+	# only is a list of block names to run.
+	def run_plan(self, plan, fname, only=None, group=True):
+		if not isinstance(plan, list):
+			plan = json.load(open(plan))
+		if only is not None:
+			plan = [b for b in plan if b.get("name") in only]
+		if group:
+			plan = self.order(plan)
+		self.dvm_cfg = None
+		self.dut_dirty = True
+		self.fo = open(fname + ".txt", "w")
+		rep = {
+			"id": self.dut.id,
+			"chan": self.chan,
+			"term": self.term,
+			"start": time.time(),
+			"blocks": [],
+		}
+		try:
+			for b in plan:
+				rep["blocks"].append(self.run_block(b))
+		finally:
+			self.fo.close()
+			self.fo = None
+			rep["end"] = time.time()
+			n = 0
+			f = 0
+			for b in rep["blocks"]:
+				for r in b["tests"]:
+					n += 1
+					if r["result"] != "PASS":
+						f += 1
+			rep["tests"] = n
+			rep["failed"] = f
+			fo = open(fname + ".json", "w")
+			json.dump(rep, fo, indent=1)
+			fo.close()
+		return rep
+
+	def operational_verification(self, plan=None, only=None):
+		if plan is None:
+			plan = op_ver_plan
+		return self.run_plan(plan,
+		    "_hp3245_operational_verification_%d" % self.chan, only)
+
+###############################################################
+# 3458A noise for the short integration times tried by adaptive_rd(),
+# as (NPLC, relative to the reading or limits, absolute floor).
+# These are conservative guesses from the datasheet transfer noise,
+# a reading must be "decisive" times the noise from both limits to
+# be accepted without going on to the next NPLC.
+
+decisive = 6
+
+nplc_noise = {
+	"DCV": ((1, 2e-6, 1e-6), (10, .5e-6, .2e-6)),
+	"DCI": ((1, 20e-6, 2e-10), (10, 5e-6, 5e-11)),
+	"OHM": ((1, 10e-6, 1e-4), (10, 3e-6, 3e-5)),
+}
+
+###############################################################
+# Operational verification limits
+
+op_ver_plan = [
+	{
+		"name": "dcv",
+		"hdr": "DCV Amplitude Accuracy - High Res",
+		"cable": "voltage",
+		"dvm": ["DCV"],
+		"steps": [
+			["dut", "RANGE 1"],
+			["apply", "DCV",  1.25, 84e-6, "V"],
+			["apply", "DCV",  0.00, 31e-6, "V"],
+			["apply", "DCV", -1.25, 84e-6, "V"],
+			["dut", "RANGE 10"],
+			["apply", "DCV",  10.25, 570e-6, "V"],
+			["apply", "DCV",   0.00, 180e-6, "V"],
+			["apply", "DCV", -10.25, 570e-6, "V"],
+		],
+	}, {
+		"name": "dcv",
+		"hdr": "DCV Amplitude Accuracy - Low Res",
+		"cable": "voltage",
+		"dvm": ["DCV"],
+		"steps": [
+			["dut", "DCRES LOW", "RANGE .15625"],
+			["apply", "DCV",  .15625, 1.00e-3, "V"],
+			["apply", "DCV",  .00000,  .73e-3, "V"],
+			["apply", "DCV", -.15625, 1.00e-3, "V"],
+			["dut", "RANGE 10"],
+			["apply", "DCV",  10.0, 54e-3, "V"],
+			["apply", "DCV",   0.0, 37e-3, "V"],
+			["apply", "DCV", -10.0, 54e-3, "V"],
+		],
+	}, {
+		"name": "dcv",
+		"hdr": "DCV Zero Ohm Output Resistance",
+		"cable": "voltage",
+		"dvm": ["OHM"],
+		"steps": [
+			["limit", 0, None, .5, "Ohm"],
+		],
+	}, {
+		"name": "acv",
+		"hdr": "ACV Amplitude Accuracy - Sine Wave",
+		"cable": "voltage",
+		"dvm": ["ACV"],
+		"steps": [
+			["dut", "IMP 50", "APPLY ACV .15625", "RANGE .15625"],
+			["apply", "ACV",  .15625,  720e-6, "V", .11047],
+			["apply", "ACV",  .11719,  640e-6, "V", .08282],
+			["apply", "ACV",  .07813,  560e-6, "V", .05523],
+			["dut", "ARANGE ON", "APPLY ACV 10", "RANGE 10"],
+			["apply", "ACV",  10.0,  46e-3, "V", 7.070],
+			["apply", "ACV",   7.5,  41e-3, "V", 5.303],
+			["apply", "ACV",   5.0,  36e-3, "V", 3.535],
+		],
+	}, {
+		"name": "acv",
+		"hdr": "ACV Amplitude Accuracy - Square Wave",
+		"cable": "voltage",
+		"dvm": ["ACV"],
+		"steps": [
+			["dut", "IMP 50", "APPLY SQV .15625", "RANGE .15625"],
+			["apply", "SQV",  .15625,  1.27e-3, "V"],
+			["apply", "SQV",  .11719,  1.15e-3, "V"],
+			["apply", "SQV",  .07813,  1.04e-3, "V"],
+			["dut", "ARANGE ON", "APPLY SQV 10", "RANGE 10"],
+			["apply", "SQV",  10.0,  81e-3, "V"],
+			["apply", "SQV",   7.5,  74e-3, "V"],
+			["apply", "SQV",   5.0,  67e-3, "V"],
+		],
+	}, {
+		"name": "offset",
+		"hdr": "Offset Accuracy",
+		"cable": "voltage",
+		"dvm": ["DCV"],
+		"steps": [
+			["dut", "IMP 50", "APPLY ACV 5", "FREQ 600"],
+			["dut", "DCOFF -2.5"],
+			["apply", "ACV",  5.0,  86.5e-3, "V", -5.0],
+			["dut", "DCOFF 2.5"],
+			["apply", "ACV",  5.0,  86.5e-3, "V", +5.0],
+			["dut", "DCOFF 0.0390625"],
+			["apply", "ACV",  .078125,  1.352e-3, "V", 0.078125],
+			["dut", "DCOFF -0.0390625"],
+			["apply", "ACV",  .078125,  1.352e-3, "V", -0.078125],
+		],
+	}, {
+		"name": "flatness",
+		"hdr": "Flatness",
+		"cable": "voltage",
+		"dvm": ["ACDCV"],
+		"steps": [
+			["dut", "IMP 50", "APPLY ACV 10", "FREQ 1000"],
+			["apply", "ACV", 10.0, 54e-3, "V", 7.070],
+			["dvm", "SMATH 9", "MATH DB"],
+			["dut", "FREQ 10000"],
+			["apply", "ACV", 10.0, .07, "dB", 0.0],
+			["dut", "FREQ 1000000"],
+			["apply", "ACV", 10.0, 2.0, "dB", 0.0],
+		],
+	}, {
+		"name": "dci",
+		"hdr": "DCI Amplitude Accuracy - High Res",
+		"cable": "current",
+		"dvm": ["DCI"],
+		"steps": [
+			["dut", "RANGE 0.0001"],
+			["apply", "DCI",  .0001, 8.5e-9, "A"],
+			["apply", "DCI",  .0000, 3.3e-9, "A"],
+			["apply", "DCI", -.0001, 8.5e-9, "A"],
+			["dut", "RANGE 0.1"],
+			["apply", "DCI",  .1, 23.3e-6, "A"],
+			["apply", "DCI",  .0,  3.3e-6, "A"],
+			["apply", "DCI", -.1, 23.3e-6, "A"],
+		],
+	}, {
+		"name": "dci",
+		"hdr": "DCI Amplitude Accuracy - Low Res",
+		"cable": "current",
+		"dvm": ["DCI"],
+		"steps": [
+			["dut", "DCRES LOW", "RANGE 0.0001"],
+			["apply", "DCI",  .0001, 630e-9, "A"],
+			["apply", "DCI",  .0000, 380e-9, "A"],
+			["apply", "DCI", -.0001, 630e-9, "A"],
+			["dut", "RANGE 0.1"],
+			["apply", "DCI",  .1,  720e-6, "A"],
+			["apply", "DCI",  .0,  400e-6, "A"],
+			["apply", "DCI", -.1,  720e-6, "A"],
+		],
+	},
+]
 
 if __name__ == "__main__":
 	dvm = hp3458a.hp3458a()
@@ -3,8 +3,9 @@
 import sys
 import time
 import prologix_usb
+import scpi
 
-class hp33120a(prologix_usb.gpib_dev):
+class hp33120a(scpi.scpi, prologix_usb.gpib_dev):
 
 	def __init__(self, name = "gpib0", adr = 10):
 		prologix_usb.gpib_dev.__init__(self, name, adr)
@@ -12,30 +13,10 @@ class hp33120a(prologix_usb.gpib_dev):
 		self.spoll_data = 0x10
 		self.spoll_cmd = 0x0
 		self.errors()
-		x = self.ask("*IDN?").split(",")
-		if x[0] != "HEWLETT-PACKARD" or x[1] != "33120A":
-			self.fail("HP33120 ID Failure (%s)" % x)
+		self.idn_check("HEWLETT-PACKARD", "33120A")
 		self.id = "HP33120A"
 		self.AOK()
 
-	#######################
-	# PYLT Standard methods
-	#######################
-
-	def errors(self, f=sys.stderr):
-		r = False
-		while True:
-			x = self.ask("SYST:ERR?")
-			if x == '+0,"No error"':
-				break
-			f.write(self.id + ".ERROR: " +  x + "\n")
-			r = True
-		return r
-
-	def reset(self):
-		self.wr("*RST");
-		self.AOK()
-
 if __name__ == "__main__":
 	d = hp33120a()
 	print("Device responds: " + d.ask("*IDN?"))
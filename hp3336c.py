@@ -55,6 +55,86 @@ class hp3336c(prologix_usb.gpib_dev):
 		assert x[-2:] == "DB"
 		return float(x[2:-2])
 
+	##################
+	# Sweeps
+	##################
+
+	###############################################################
+	# Set up the internal sweep, from start to stop Hz in tsweep
+	# seconds, linear or log, as one command with one error check.
+	def sweep_setup(self, start, stop, tsweep, log=False):
+		s = "ST%.3fHZSP%.3fHZTI%.3fSE" % (start, stop, tsweep)
+		if log:
+			s += "SM2"
+		else:
+			s += "SM1"
+		self.wr(s)
+		self.AOK()
+		self.sweep_p = (start, stop, tsweep, log)
+
+	# Start a single sweep, returns the time it started
+	def sweep_start(self):
+		self.wr("SS")
+		self.wr("SS")
+		self.sweep_t0 = time.time()
+		return self.sweep_t0
+
+	# The frequency the sweep is at at time t
+	def sweep_freq(self, t):
+		start, stop, tsweep, log = self.sweep_p
+		x = min(max((t - self.sweep_t0) / tsweep, 0.), 1.)
+		if log:
+			return start * (stop / start) ** x
+		return start + (stop - start) * x
+
+	###############################################################
+	# Run a single internal sweep and measure continuously along it.
+	# measure() is called back to back until the sweep is done, and
+	# each result is yielded with the frequency at the middle of the
+	# measurement: (freq, result)
+	def sweep_run(self, measure):
+		start, stop, tsweep, log = self.sweep_p
+		te = self.sweep_start() + tsweep
+		while True:
+			t0 = time.time()
+			if t0 >= te:
+				break
+			x = measure()
+			t1 = time.time()
+			yield self.sweep_freq((t0 + t1) * .5), x
+
+	###############################################################
+	# Step through a list of points, each a frequency or a tuple of
+	# (frequency, dBm), yielding each point once it has been set.
+	# Points are sent in buffered mode (MD2), one write per point,
+	# only the parts which changed, and without an error check per
+	# point: errors are checked once at the end.
+	def stream_points(self, points, dwell=0.):
+		f0 = None
+		a0 = None
+		self.wr("MD2")
+		try:
+			with self.error_policy("batch"):
+				for p in points:
+					if isinstance(p, (tuple, list)):
+						f,a = p
+					else:
+						f,a = p, None
+					s = ""
+					if f != f0:
+						s += "FR%.3fHZ" % f
+						f0 = f
+					if a is not None and a != a0:
+						s += "AM%.3fDB" % a
+						a0 = a
+					if s != "":
+						self.wr(s)
+					if dwell > 0:
+						time.sleep(dwell)
+					yield p
+		finally:
+			self.wr("MD1")
+
 if __name__ == "__main__":
 	d = hp3336c()
 	print("Device reponds (%s)" % d.id)
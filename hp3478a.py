@@ -5,13 +5,47 @@
 from __future__ import print_function
 import sys
 import math
+from array import array
 from datetime import datetime, timedelta
 import time
 
 # Python Imports
 import prologix_usb
+import settle
 from pylt import PyltError
 
+# Function codes (F<n>) and their names
+hp3478a_functions = {
+    "dc_volts":   (1, "DC volts"),
+    "ac_volts":   (2, "AC volts"),
+    "2wire_ohms": (3, "2-wire resistance"),
+    "4wire_ohms": (4, "4-wire resistance"),
+    "dc_amps":    (5, "DC amps"),
+    "ac_amps":    (6, "AC amps"),
+}
+
+class hp3478a_config(object):
+    '''Measurement configuration of the meter: function code, range code
+    ("A" for auto-range), digits, trigger mode and auto-zero'''
+
+    def __init__(self, function, rng="A", ndig=5, trigger=1, autozero=1):
+        self.function = function
+        self.rng = rng
+        self.ndig = ndig
+        self.trigger = trigger
+        self.autozero = autozero
+
+    def command(self):
+        return "F%dR%sN%dT%dZ%d" % (self.function, self.rng, self.ndig,
+            self.trigger, self.autozero)
+
+    def __eq__(self, other):
+        return isinstance(other, hp3478a_config) and \
+            self.command() == other.command()
+
+    def __ne__(self, other):
+        return not self == other
+
 class hp3478a(prologix_usb.gpib_dev):
     '''Class for talking to HP 3478A bench multimeters'''
 
@@ -22,12 +56,19 @@ class hp3478a(prologix_usb.gpib_dev):
         self.attr("rd_mode", "eoi")
         self.attr("eos", 0)
         self.attr("eoi", 1)
+        # What we last configured the meter for, None if unknown
+        self.config = None
 
-    def _setup_dmm(self, command, delay=3.0):
+    def _setup_dmm(self, command, delay=3.0, tol=None):
         '''Clear the adaptor, send the command, sleep for settling and throw 
-        away the first 2 readings'''
+        away the first 2 readings.
+        If a tolerance [tol] is given, take readings until they have settled
+        to within it instead, giving up after [delay] x 10 seconds.'''
         self.clear()
         self.wr(command)
+        if tol is not None:
+            settle.settle(settle.reader(self), tol, tmo=delay * 10000)
+            return
         # Sleep to allow autorange to happen and throw first readings away
         time.sleep(delay)
         self.rd()
@@ -53,115 +94,106 @@ class hp3478a(prologix_usb.gpib_dev):
         print("Taken %d samples" % samples)
         return readings
 
-    def read_dc_volts(self, ndig=5, nsamples=1, dbg=False):
-        '''Perform measurements of DC volts. Auto-ranging and auto-zero is turned on.
-        The number of digits [ndig, default=5] can be specified as 3, 4 or 5 (equivalent to 3 1/2, 4 1/2 or
-        5 1/2 digit display) and the number of samples [nsamples, default=1] can be specified.
-        A list of tuples of the UTC date/time and the readings is returned.'''
-    
-        print("Measuring %d samples of DC volts at %d.5 digits" % (nsamples, ndig))
-        if ndig < 3 or ndig > 5:
-            raise PyltError(self.id, "Invalid number of digits (must be 3, 4 or 5")
-        # Set command string for DC volts (F1), auto-range (RA), number of digits (N<ndig>), 
-        # single trigger (T1), autozero on (Z1)
-        command = "F1RAN%dT1Z1" % ndig
-        self.wr(command)
-        self._setup_dmm(command)
+    def stream_samples(self, nsamples=None, chunk=4096, fname=None, fast=True):
+        '''Generator yielding readings in chunks of [chunk, default=4096] as
+        a tuple of two array('d'): monotonic timestamps in nanoseconds and
+        readings.  The arrays are reused for the next chunk, so copy them if
+        they need to be kept.  Stops after [nsamples] readings, or never.
+        With [fast, default=True] every reading is triggered with the fast
+        trigger (T5), else the meter's current trigger mode is used.
+        If [fname] is given, every chunk is also appended to the
+        readings_store of that name, with the timestamps converted to
+        seconds since the epoch, so long runs can be logged in constant
+        memory.'''
 
-        # Take readings and return them
-        readings = self._take_samples(nsamples, dbg)
-        return readings
+        if hasattr(time, "monotonic_ns"):
+            clock = time.monotonic_ns
+        else:
+            clock = lambda: time.time() * 1e9
+        epoch = time.time() - clock() * 1e-9
+        store = None
+        if fname:
+            import readings_store
+            store = readings_store.store(fname, id=self.id)
+        ts = array('d', [0.]) * chunk
+        vs = array('d', [0.]) * chunk
+        raw = [None] * chunk
+        if fast and self.config is not None:
+            self.config.trigger = 5
+        n = 0
+        while nsamples is None or n < nsamples:
+            # Keep the loop to bus I/O, parse when the chunk is full
+            m = chunk
+            if nsamples is not None:
+                m = min(m, nsamples - n)
+            for i in range(m):
+                if fast:
+                    self.wr("T5")
+                ts[i] = clock()
+                raw[i] = self.rd()
+            for i in range(m):
+                vs[i] = float(raw[i])
+            n += m
+            if m < chunk:
+                del ts[m:]
+                del vs[m:]
+            if store is not None:
+                store.append([epoch + x * 1e-9 for x in ts], vs)
+            yield ts, vs
 
-    def read_ac_volts(self, ndig=5, nsamples=1, dbg=False):
-        '''Perform measurements of AC volts. Auto-ranging and auto-zero is turned on.
+    def measure(self, function, ndig=5, nsamples=1, rng="A", dbg=False,
+        tol=None):
+        '''Perform measurements of [function], one of the keys of
+        hp3478a_functions, e.g. "dc_volts".  Auto-zero is turned on.
+        The range [rng, default="A"] is a range code from the table in doc
+        below, "A" for auto-ranging.
         The number of digits [ndig, default=5] can be specified as 3, 4 or 5 (equivalent to 3 1/2, 4 1/2 or
         5 1/2 digit display) and the number of samples [nsamples, default=1] can be specified.
+        The meter is only reconfigured, and given time to settle, if the
+        function, range or digits differ from the previous measurement.
+        With a tolerance [tol] the readings after reconfiguring are taken
+        until they have settled to within it, see settle.settle(), rather
+        than sleeping a fixed time.
         A list of tuples of the UTC date/time and the readings is returned.'''
 
-        print("Measuring %d samples of AC volts at %d.5 digits" % (nsamples, ndig))
+        if function not in hp3478a_functions:
+            raise PyltError(self.id, "Invalid function (%s)" % function)
+        code, name = hp3478a_functions[function]
+        print("Measuring %d samples of %s at %d.5 digits" % (nsamples, name, ndig))
         if ndig < 3 or ndig > 5:
             raise PyltError(self.id, "Invalid number of digits (must be 3, 4 or 5")
-        # Set command string for AC volts (F2), auto-range (RA), number of digits (N<ndig>), 
-        # single trigger (T1), autozero on (Z1)
-        command = "F2RAN%dT1Z1" % ndig
-        self.wr(command)
-        self._setup_dmm(command)
+        config = hp3478a_config(code, rng, ndig)
+        if config != self.config:
+            self._setup_dmm(config.command(), tol=tol)
+            self.config = config
 
         # Take readings and return them
         readings = self._take_samples(nsamples, dbg)
         return readings
 
-    def read_2wire_ohms(self, ndig=5, nsamples=1, dbg=False):
-        '''Perform measurements of 2-wire resistance. Auto-ranging and auto-zero is turned on.
-        The number of digits [ndig, default=5] can be specified as 3, 4 or 5 (equivalent to 3 1/2, 4 1/2 or
-        5 1/2 digit display) and the number of samples [nsamples, default=1] can be specified.
-        A list of tuples of the UTC date/time and the readings is returned.'''
+    def read_dc_volts(self, ndig=5, nsamples=1, dbg=False, tol=None):
+        '''Perform measurements of DC volts, see measure()'''
+        return self.measure("dc_volts", ndig, nsamples, dbg=dbg, tol=tol)
 
-        print("Measuring %d samples of 2-wire resistance at %d.5 digits" % (nsamples, ndig))
-        if ndig < 3 or ndig > 5:
-            raise PyltError(self.id, "Invalid number of digits (must be 3, 4 or 5")
-        # Set command string for 2-wire ohms (F3), auto-range (RA), number of digits (N<ndig>), 
-        # single trigger (T1), autozero on (Z1)
-        command = "F3RAN%dT1Z1" % ndig
-        self._setup_dmm(command)
+    def read_ac_volts(self, ndig=5, nsamples=1, dbg=False, tol=None):
+        '''Perform measurements of AC volts, see measure()'''
+        return self.measure("ac_volts", ndig, nsamples, dbg=dbg, tol=tol)
 
-        # Take readings and return them
-        readings = self._take_samples(nsamples, dbg)
-        return readings
+    def read_2wire_ohms(self, ndig=5, nsamples=1, dbg=False, tol=None):
+        '''Perform measurements of 2-wire resistance, see measure()'''
+        return self.measure("2wire_ohms", ndig, nsamples, dbg=dbg, tol=tol)
 
-    def read_4wire_ohms(self, ndig=5, nsamples=1, dbg=False):
-        '''Perform measurements of 4-wire resistance. Auto-ranging and auto-zero is turned on.
-        The number of digits [ndig, default=5] can be specified as 3, 4 or 5 (equivalent to 3 1/2, 4 1/2 or
-        5 1/2 digit display) and the number of samples [nsamples, default=1] can be specified.
-        A list of tuples of the UTC date/time and the readings is returned.'''
+    def read_4wire_ohms(self, ndig=5, nsamples=1, dbg=False, tol=None):
+        '''Perform measurements of 4-wire resistance, see measure()'''
+        return self.measure("4wire_ohms", ndig, nsamples, dbg=dbg, tol=tol)
 
-        print("Measuring %d samples of 4-wire resistance at %d.5 digits" % (nsamples, ndig))
-        if ndig < 3 or ndig > 5:
-            raise PyltError(self.id, "Invalid number of digits (must be 3, 4 or 5")
-        # Set command string for 4-wire resistance (F4), auto-range (RA), number of digits (N<ndig>), 
-        # single trigger (T1), autozero on (Z1)
-        command = "F4RAN%dT1Z1" % ndig
-        self._setup_dmm(command)
-
-        # Take readings and return them
-        readings = self._take_samples(nsamples, dbg)
-        return readings
-
-    def read_dc_amps(self, ndig=5, nsamples=1, dbg=False):
-        '''Perform measurements of DC amps. Auto-ranging and auto-zero is turned on.
-        The number of digits [ndig, default=5] can be specified as 3, 4 or 5 (equivalent to 3 1/2, 4 1/2 or
-        5 1/2 digit display) and the number of samples [nsamples, default=1] can be specified.
-        A list of tuples of the UTC date/time and the readings is returned.'''
-    
-        print("Measuring %d samples of DC amps at %d.5 digits" % (nsamples, ndig))
-        if ndig < 3 or ndig > 5:
-            raise PyltError(self.id, "Invalid number of digits (must be 3, 4 or 5")
-        # Set command string for DC amps (F5), auto-range (RA), number of digits (N<ndig>), 
-        # single trigger (T1), autozero on (Z1)
-        command = "F5RAN%dT1Z1" % ndig
-        self._setup_dmm(command)
-
-        # Take readings and return them
-        readings = self._take_samples(nsamples, dbg)
-        return readings
-
-    def read_ac_amps(self, ndig=5, nsamples=1, dbg=False):
-        '''Perform measurements of AC amps. Auto-ranging and auto-zero is turned on.
-        The number of digits [ndig, default=5] can be specified as 3, 4 or 5 (equivalent to 3 1/2, 4 1/2 or
-        5 1/2 digit display) and the number of samples [nsamples, default=1] can be specified.
-        A list of tuples of the UTC date/time and the readings is returned.'''
+    def read_dc_amps(self, ndig=5, nsamples=1, dbg=False, tol=None):
+        '''Perform measurements of DC amps, see measure()'''
+        return self.measure("dc_amps", ndig, nsamples, dbg=dbg, tol=tol)
 
-        print("Measuring %d samples of AC amps at %d.5 digits" % (nsamples, ndig))
-        if ndig < 3 or ndig > 5:
-            raise PyltError(self.id, "Invalid number of digits (must be 3, 4 or 5")
-        # Set command string for AC amps (F6), auto-range (RA), number of digits (N<ndig>), 
-        # single trigger (T1), autozero on (Z1)
-        command = "F6RAN%dT1Z1" % ndig
-        self._setup_dmm(command, delay=3.0)
-
-        # Take readings and return them
-        readings = self._take_samples(nsamples, dbg)
-        return readings
+    def read_ac_amps(self, ndig=5, nsamples=1, dbg=False, tol=None):
+        '''Perform measurements of AC amps, see measure()'''
+        return self.measure("ac_amps", ndig, nsamples, dbg=dbg, tol=tol)
 
     def write_results(self, out_file, readings, units=None):
         """Write out the set of <readings> to <out_file>.
@@ -1,5 +1,8 @@
 #!/usr/local/bin/python
 
+import hashlib
+import json
+import os
 import sys
 import time
 import prologix_usb
@@ -14,6 +17,7 @@ class hp3577a(prologix_usb.gpib_dev):
 		if y[0] != "HP3577A":
 			self.fail("HP3577A ID failure (%s)" % x)
 		self.id = y[0]
+		self.loaded = dict()
 		self.errors()
 		self.AOK()
 
@@ -31,6 +35,117 @@ class hp3577a(prologix_usb.gpib_dev):
 			r = True
 		return r
 
+	###############################################################
+	# Anything but a dump may change the state, so forget what
+	# relearn() loaded.
+	def wr(self, s):
+		if not s.startswith(quiet):
+			self.loaded = dict()
+		prologix_usb.gpib_dev.wr(self, s)
+
+	#################
+	# HP3577A methods
+	#################
+
+	###############################################################
+	# Complete instrument state snapshots
+	#
+	# learn() reads the learn mode string (LMO) and the storage
+	# registers D1-D4 (DD1-4), and keeps them in a content addressed
+	# cache directory, files named by their SHA1.  It returns the key
+	# of the snapshot, which relearn() puts back with one transfer per
+	# part (LMI, LD1-4).  The learn string is always sent, as the
+	# state may have been changed from the front panel or by another
+	# host.  The registers, which take longer, are skipped if this
+	# process loaded them and sent nothing which might change them
+	# since.
+	#
+	# Usage is:
+	#	k = d.learn()
+	#	...
+	#	d.relearn(k)
+	#
+	states = "_.hp3577a.states"
+
+	def blob_put(self, b):
+		b = bytes(b)
+		h = hashlib.sha1(b).hexdigest()
+		f = os.path.join(self.states, h)
+		if not os.path.exists(f):
+			if not os.path.isdir(self.states):
+				os.makedirs(self.states)
+			fo = open(f + ".tmp", "wb")
+			fo.write(b)
+			fo.close()
+			os.rename(f + ".tmp", f)
+		return h
+
+	def blob_get(self, h):
+		fi = open(os.path.join(self.states, h), "rb")
+		b = fi.read()
+		fi.close()
+		assert hashlib.sha1(b).hexdigest() == h
+		return b
+
+	def learn(self, regs=(1, 2, 3, 4)):
+		self.AOK()
+		m = dict()
+		self.wr("LMO")
+		m["lmo"] = self.blob_put(self.rd_block())
+		if len(regs) > 0:
+			self.wr("FM3")
+		for i in regs:
+			self.wr("DD%d" % i)
+			m["d%d" % i] = self.blob_put(self.rd_block())
+		self.wr("FM1")
+		self.AOK()
+		self.loaded = dict(m)
+		return self.blob_put(json.dumps(m, sort_keys=True).encode())
+
+	def relearn(self, key):
+		m = json.loads(self.blob_get(key).decode())
+		l = ["lmo"] + sorted([i for i in m if i != "lmo"])
+		for n in l:
+			if n != "lmo" and self.loaded.get(n) == m[n]:
+				continue
+			b = self.blob_get(m[n])
+			if n == "lmo":
+				c = b"LMI#A"
+			else:
+				self.wr("FM3")
+				c = b"LD" + n[1:].encode() + b"#A"
+			c += bytearray([len(b) >> 8, len(b) & 0xff])
+			self.wr_bin(bytes(c) + b)
+			self.loaded[n] = m[n]
+		self.wr("FM1")
+		self.AOK()
+
+	###############################################################
+	# Read trace 1 or 2 (DT1/DT2), in display units, as a numpy array
+	def read_trace(self, n=1):
+		import numpy
+		self.wr("FM2")
+		self.wr("DT%d" % n)
+		x = self.rd_block()
+		self.wr("FM1")
+		return numpy.frombuffer(bytes(x), dtype=">f8").astype(numpy.float64)
+
+	###############################################################
+	# Read complex data, from a register ("D1" ... "D4") or an input
+	# ("R", "A", "B"), as a numpy array.  See trace_math.py for what
+	# to do with them.
+	def read_data(self, name="D1"):
+		import numpy
+		c = {"R": "DRR", "A": "DRA", "B": "DRB"}.get(name)
+		if c is None:
+			c = "DD" + name[1:]
+		self.wr("FM2")
+		self.wr(c)
+		x = self.rd_block()
+		self.wr("FM1")
+		a = numpy.frombuffer(bytes(x), dtype=">f8").astype(numpy.float64)
+		return a[0::2] + 1j * a[1::2]
+
 	def screen_dump(self, fname="_.hp3577a.eps", format="eps"):
 		print(self.id + " Taking a " + format +
 		    " screendump into " + fname)
@@ -56,6 +171,10 @@ class hp3577a(prologix_usb.gpib_dev):
 		p.stdin.close()
 		p.wait()
 
+# Commands which do not change the instrument state
+quiet = ("ID?", "DMS", "LMO", "DD", "DT", "DM", "DR", "DAN", "DCH", "DKY",
+    "FM")
+
 if __name__ == "__main__":
 	d = hp3577a()
 	print("Device reponds (%s)" % d.ask("ID?"))
@@ -56,6 +56,12 @@ class hp6626a(prologix_usb.gpib_dev):
 		self.__out=dict()
 		self.autorange=dict()
 
+		# Readings from readout() younger than this many seconds
+		# are reused rather than asked for again.
+		self.max_age = 0.
+		self.__meas = None
+		self.__meas_t = 0.
+
 		# The possible pairings of outputs
 		self.__dual = {
 			12: (1,2),
@@ -80,7 +86,8 @@ class hp6626a(prologix_usb.gpib_dev):
 
 		for i in (1, 2, 3, 4, 12, 34):
 			self.autorange[i] = True
-		self.__readback()
+		if not self.__cached():
+			self.__readback()
 		self.__dualvr()
 	
 	def __dualvr(self):
@@ -104,14 +111,87 @@ class hp6626a(prologix_usb.gpib_dev):
 		else:
 			return 2.0
 
+	###############################################################
+	# Fast-start: restore the ranges from the adapter cache, but
+	# never trust cached setpoints, the supply may have been power
+	# cycled or changed from the front panel or another host since.
+	# One compound VSET?/ISET?/OUT? read gives the setpoints, if
+	# any moved by more than the programming resolution from the
+	# cached ones the ranges may have changed too, and the full
+	# readback is done instead.
+	def __cached(self):
+		x = self.cache_get("state")
+		if x is None:
+			return False
+		q = list()
+		for i in range(1,5):
+			q.append("VSET? %d" % i)
+			q.append("ISET? %d" % i)
+			q.append("OUT? %d" % i)
+		y = self.ask_batch(q)
+		def moved(a, b):
+			return math.fabs(a - b) > .001 + .001 * math.fabs(b)
+		for i in range(1,5):
+			j = i - 1
+			k = j * 3
+			v = float(y[k])
+			a = float(y[k + 1])
+			o = int(y[k + 2])
+			if moved(v, x["vset"][j]) or moved(a, x["iset"][j]) or \
+			    o != x["out"][j]:
+				return False
+			self.__vset[i] = v
+			self.__vrset[i] = x["vrset"][j]
+			self.__iset[i] = a
+			self.__irset[i] = x["irset"][j]
+			self.__out[i] = o
+		self.__dualset()
+		return True
+
+	def __cache_state(self):
+		x = dict()
+		for n, d in (
+		    ("vset", self.__vset),
+		    ("vrset", self.__vrset),
+		    ("iset", self.__iset),
+		    ("irset", self.__irset),
+		    ("out", self.__out)):
+			x[n] = [d[i] for i in range(1,5)]
+		self.cache_put("state", x)
+
+	###############################################################
+	# Ask many queries, in as few compound commands as the input
+	# buffer allows.
+	batch_max = 20
+
+	def ask_batch(self, qs):
+		r = list()
+		for i in range(0, len(qs), self.batch_max):
+			r.extend(self.ask_many(qs[i:i + self.batch_max]))
+		return r
+
 	def __readback(self):
 		# Initilialize cached settings
+		q = list()
+		for i in range(1,5):
+			q.append("VSET? %d" % i)
+			q.append("VRSET? %d" % i)
+			q.append("ISET? %d" % i)
+			q.append("IRSET? %d" % i)
+			q.append("OUT? %d" % i)
+		x = self.ask_batch(q)
 		for i in range(1,5):
-			self.__vset[i] = float(self.ask("VSET? %d" % i))
-			self.__vrset[i] = float(self.ask("VRSET? %d" % i))
-			self.__iset[i] = float(self.ask("ISET? %d" % i))
-			self.__irset[i] = float(self.ask("IRSET? %d" % i))
-			self.__out[i] = int(self.ask("OUT? %d" % i))
+			j = (i - 1) * 5
+			self.__vset[i] = float(x[j])
+			self.__vrset[i] = float(x[j + 1])
+			self.__iset[i] = float(x[j + 2])
+			self.__irset[i] = float(x[j + 3])
+			self.__out[i] = int(x[j + 4])
+		self.__dualset()
+		self.__cache_state()
+		self.__meas_t = 0.
+
+	def __dualset(self):
 		for i in (12, 34):
 			c1,c2 = self.__dual[i]
 			self.__iset[i] = min(self.__iset[c1], self.__iset[c2])
@@ -120,6 +200,47 @@ class hp6626a(prologix_usb.gpib_dev):
 				del self.__vset[i]
 				del self.__vrset[i]
 
+	###############################################################
+	# Measured voltage, current and status of all four outputs, in
+	# one bus exchange, as a dict of dicts: x["v"][chan] etc.
+	# Reuses the previous result if younger than max_age seconds,
+	# any change of settings forces a fresh readout.
+	def readout(self, max_age=None):
+		if max_age is None:
+			max_age = self.max_age
+		if self.__meas is not None and \
+		    time.time() - self.__meas_t < max_age:
+			return self.__meas
+		q = list()
+		for i in range(1,5):
+			q.append("VOUT? %d" % i)
+			q.append("IOUT? %d" % i)
+			q.append("STS? %d" % i)
+		t = time.time()
+		x = self.ask_batch(q)
+		m = {"v": dict(), "i": dict(), "s": dict()}
+		for i in range(1,5):
+			j = (i - 1) * 3
+			m["v"][i] = float(x[j])
+			m["i"][i] = float(x[j + 1])
+			m["s"][i] = int(x[j + 2])
+		self.__meas = m
+		self.__meas_t = t
+		return m
+
+	###############################################################
+	# Voltage, current and status of all outputs as numpy arrays,
+	# indexed by channel - 1.  Same interface as hp6653a.read_all()
+	def read_all(self, max_age=None):
+		import numpy
+		m = self.readout(max_age)
+		c = range(1,5)
+		return (
+		    numpy.array([m["v"][i] for i in c]),
+		    numpy.array([m["i"][i] for i in c]),
+		    numpy.array([m["s"][i] for i in c], dtype=numpy.int32)
+		)
+
 	#######################
 	# PYLT Standard methods
 	#######################
@@ -141,13 +262,11 @@ class hp6626a(prologix_usb.gpib_dev):
 		f.write(self.id + ".STATUS:\n")
 		f.write("CH ON     VR    VSET   VOUT?    IR    ISET   IOUT? STATUS\n")
 		f.write("---------------------------------------------------------\n")
-		v=dict()
-		a=dict()
-		s=dict()
+		m = self.readout()
+		v = m["v"]
+		a = m["i"]
+		s = m["s"]
 		for i in range(1,5):
-			v[i] = float(self.ask("VOUT? %d" % i))
-			a[i] = float(self.ask("IOUT? %d" % i))
-			s[i] = int(self.ask("STS? %d" % i))
 			f.write("%2d  %d   %4.1f %7.3f %7.3f %5.3f %7.3f %7.3f" 
 			     % (i, self.__out[i], self.__vrset[i], self.__vset[i], v[i],
 				self.__irset[i], self.__iset[i], a[i]))
@@ -214,6 +333,8 @@ class hp6626a(prologix_usb.gpib_dev):
 		elif self.__vrset[chan] != vx:
 			self.wr("VRSET %d" % chan + " %.1f" % vx)
 		self.__vrset[chan] = vx
+		self.__cache_state()
+		self.__meas_t = 0.
 		self.AOK()
 
 	def vset(self, chan, volt):
@@ -244,9 +365,13 @@ class hp6626a(prologix_usb.gpib_dev):
 				self.vset(c1, v0)
 				self.vset(c2, v2 + v0)
 		self.__vset[chan] = volt
+		self.__cache_state()
+		self.__meas_t = 0.
 		self.AOK()
 
 	def vread(self, chan):
+		if self.max_age > 0 and chan in (1, 2, 3, 4):
+			return self.readout()["v"][chan]
 		self.AOK()
 		assert chan in self.__vset
 		v = float(self.ask("VOUT? %d" % chan))
@@ -281,6 +406,8 @@ class hp6626a(prologix_usb.gpib_dev):
 			if self.__irset[chan] != ix:
 				self.wr("IRSET %d" % chan + " %.3f" % ix)
 			self.__irset[chan] = ix
+		self.__cache_state()
+		self.__meas_t = 0.
 		self.AOK()
 
 	def iset(self, chan, amps):
@@ -298,9 +425,13 @@ class hp6626a(prologix_usb.gpib_dev):
 			if self.__iset[chan] != amps:
 				self.wr("ISET %d" % chan + " %.6f" % amps)
 			self.__iset[chan] = amps
+		self.__cache_state()
+		self.__meas_t = 0.
 		self.AOK()
 
 	def iread(self, chan):
+		if self.max_age > 0 and chan in (1, 2, 3, 4):
+			return self.readout()["i"][chan]
 		self.AOK()
 		assert chan in self.__iset
 		a = float(self.ask("IOUT? %d" % chan))
@@ -2,11 +2,16 @@
 
 from __future__ import print_function
 
+import os
 import sys
 import time
+import json
 
 import hp6626a
 import hp34401a
+import bus_engine
+import cal_loop
+import settle
 
 p=hp6626a.hp6626a(name="gpib1")
 print(p.id)
@@ -16,6 +21,14 @@ p.errors()
 d=hp34401a.hp34401a(name="gpib0")
 print(d.id)
 
+# The supply and the DVM are on different adapters, so they can be
+# set up at the same time.
+e=bus_engine.engine()
+
+# Completed calibration steps, so an interrupted run can be resumed.
+# Remove the file to start over.
+ckpt_file = "_.hp6626a_cal.ckpt"
+
 def dvm_volt():
 	d.reset()
 	d.errors()
@@ -28,77 +41,93 @@ def dvm_amp():
 	d.wr("CONF:CURR:DC DEF,MIN")
 	d.wr("TRIG:SOUR BUS")
 
+# FETC? is held off until the reading is done, so wait for the
+# message available bit rather than a fixed time.
 def rddvm(n=3):
 	d.errors()
 	d.wr("INIT")
 	d.trigger()
-	time.sleep(6)
-	a = d.ask("FETC?")
+	d.wr("FETC?")
+	d.wait_data(tmo=30000)
+	a = d.rd()
 	print(">>> " + a)
 	return float(a)
 
-def pwr(s, tmo=1):
+# Wait for the supply to report ready
+def pwr(s, tmo=30):
 	print("#### " + s)
 	sys.stdout.flush()
 	p.wr(s)
-	time.sleep(tmo)
+	pwr_poll(tmo)
 	p.errors()
 
-def pwr_poll():
+def pwr_poll(tmo=30):
 	t0 = time.time()
-	for i in range(300):
-		a = p.spoll()
-		if a & 0x10:
-			print("#### ready", time.time() - t0, a)
-			return
-		time.sleep(.1)
+	p.wait_cmd(tmo * 1000)
+	print("#### ready", time.time() - t0)
 
 def pwr_on():
 	for i in range(1,5):
 		p.wr("OUT %d,1" % i)
-	time.sleep(1)
+	pwr_poll()
 
 def pwr_off():
 	for i in range(1,5):
 		p.wr("OUT %d,0" % i)
 
 
+# The ready bit only says the supply has parsed the command, and may
+# still be set from the previous one, so it says nothing about the
+# output having settled.  Instead DVM readings are taken until the
+# last few drift less than settle_ppm of the reading (or settle_floor
+# for readings near zero), and the last one is used.
+settle_ppm = 20
+settle_floor = 5e-6
+
+def rd_settled():
+	x = rddvm()
+	tol = max(abs(x) * settle_ppm * 1e-6, settle_floor)
+	def readings():
+		yield x
+		while True:
+			yield rddvm()
+	return settle.settle(readings(), tol, window=3, tmo=60000)
+
+# The readings are taken once the supply output has settled
+cal = cal_loop.loop(rd_settled, lambda c,tmo: pwr(c, tmo * 1e-3),
+    fname="_.hp6626a_cal.log")
+
+###############################################################
+# Set up the DVM and the supply in parallel
+def setup(dvm_func, *pwr_cmds):
+	def pwr_setup():
+		p.errors()
+		for i in pwr_cmds:
+			pwr(i)
+		pwr_on()
+	def dvm_setup():
+		dvm_func()
+		d.errors()
+	e.submit(d, dvm_setup)
+	e.submit(p, pwr_setup)
+	e.join()
+
 def cal_volt(chan, vrange):
-	dvm_volt()
-	d.errors()
-	p.errors()
 	t0 = time.time()
 	print("#--- Calibrating channel %d Voltage Range %g" % (chan, vrange))
 
-	pwr("VRSET %d,%g" % (chan, vrange))
-	pwr_on()
-
-	pwr("VLO %d" % chan)
-	time.sleep(1)
-	vlo = rddvm()
-	assert vlo < 0.5
-
-	pwr("VHI %d" % chan)
-	time.sleep(1)
-	vhi = rddvm()
-	assert vhi > vrange
-
-	d.errors()
-
-	pwr("VDATA %d,%.9f,%.9f" % (chan, vlo, vhi))
-
-	pwr("VRLO %d" % chan)
-	time.sleep(1)
-	vrlo = rddvm();
+	setup(dvm_volt, "VRSET %d,%g" % (chan, vrange))
 
-	pwr("VRHI %d" % chan)
-	time.sleep(1)
-	vrhi = rddvm();
-
-	d.errors()
-	p.errors()
-
-	pwr("VRDAT %d,%.9f,%.9f" % (chan, vrlo, vrhi))
+	cal.run([
+		{"n": "VLO", "dut": "VLO %d" % chan,
+		    "check": lambda x: x < 0.5},
+		{"n": "VHI", "dut": "VHI %d" % chan,
+		    "check": lambda x: x > vrange,
+		    "submit": "VDATA %d,%%.9f,%%.9f" % chan},
+		{"n": "VRLO", "dut": "VRLO %d" % chan},
+		{"n": "VRHI", "dut": "VRHI %d" % chan,
+		    "submit": "VRDAT %d,%%.9f,%%.9f" % chan},
+	])
 
 	p.errors()
 	d.errors()
@@ -116,52 +145,26 @@ def cal_overvoltage(chan, vrange):
 	pwr("VRSET %d,%g" % (chan, vrange))
 	pwr_on()
 	pwr("OVCAL %d" % chan)
-	for i in range(100):
-		a = p.spoll()
-		if a & 0x10:
-			break
-		print(time.time() - t0, a)
-		time.sleep(.1)
 	pwr_off()
 
 #######################################################################
 
 def cal_amp(chan, irange):
-	dvm_amp()
-	d.errors()
-	p.errors()
 	t0 = time.time()
 	print("#--- Calibrating channel %d Ampere Range %g" % (chan, irange))
 
-	pwr("IRSET %d,%g" % (chan, irange))
-	pwr_on()
-
-	pwr("ILO %d" % chan)
-	time.sleep(1)
-	ilo = rddvm()
-	assert ilo < 0.5
-
-	pwr("IHI %d" % chan)
-	time.sleep(1)
-	ihi = rddvm()
-	assert ihi > irange
-
-	d.errors()
+	setup(dvm_amp, "IRSET %d,%g" % (chan, irange))
 
-	pwr("IDATA %d,%.9f,%.9f" % (chan, ilo, ihi))
-
-	pwr("IRLO %d" % chan)
-	pwr_poll()
-	irlo = rddvm();
-
-	pwr("IRHI %d" % chan)
-	pwr_poll()
-	irhi = rddvm();
-
-	d.errors()
-	p.errors()
-
-	pwr("IRDAT %d,%.9f,%.9f" % (chan, irlo, irhi))
+	cal.run([
+		{"n": "ILO", "dut": "ILO %d" % chan,
+		    "check": lambda x: x < 0.5},
+		{"n": "IHI", "dut": "IHI %d" % chan,
+		    "check": lambda x: x > irange,
+		    "submit": "IDATA %d,%%.9f,%%.9f" % chan},
+		{"n": "IRLO", "dut": "IRLO %d" % chan},
+		{"n": "IRHI", "dut": "IRHI %d" % chan,
+		    "submit": "IRDAT %d,%%.9f,%%.9f" % chan},
+	])
 
 	p.errors()
 	d.errors()
@@ -172,9 +175,6 @@ def cal_amp(chan, irange):
 #######################################################################
 
 def cal_sink(chan, irange):
-	dvm_amp()
-	d.errors()
-	p.errors()
 	t0 = time.time()
 	print("#--- Calibrating channel %d Ampere Range %g" % (chan, irange))
 	if chan & 1:
@@ -187,29 +187,23 @@ def cal_sink(chan, irange):
 	else:
 		pol = 1.0
 
-	pwr("IRSET %d,%g" % (chan, irange))
-	pwr("IRSET %d,%g" % (ochan, irange))
-	pwr("ISET %d,%g" % (ochan, 0))
-	pwr("VSET %d,%g" % (ochan, 7))
-
-	pwr_on()
-	time.sleep(1)
-
-	pwr("IRLN %d" % chan)
-	pwr_poll()
-	ilo = rddvm() * pol
-
-	pwr("ISET %d,%g" % (ochan, irange))
-	time.sleep(1)
-
-	pwr("IRHN %d" % chan)
-	pwr_poll()
-	ihi = rddvm() * pol
+	setup(dvm_amp,
+	    "IRSET %d,%g" % (chan, irange),
+	    "IRSET %d,%g" % (ochan, irange),
+	    "ISET %d,%g" % (ochan, 0),
+	    "VSET %d,%g" % (ochan, 7))
+
+	cal.run([
+		{"n": "IRLN", "dut": "IRLN %d" % chan},
+		{"n": "ISET", "dut": "ISET %d,%g" % (ochan, irange),
+		    "read": False},
+		{"n": "IRHN", "dut": "IRHN %d" % chan,
+		    "submit": lambda v: "NIDAT %d,%.9f,%.9f" %
+		    (chan, v[0] * pol, v[1] * pol)},
+	])
 
 	d.errors()
 
-	pwr("NIDAT %d,%.9f,%.9f" % (chan, ilo, ihi))
-
 	pwr_off()
 	print("#--- %gs " % (time.time() - t0))
 
@@ -243,48 +237,72 @@ def cal_sink_50w(chan):
 
 #######################################################################
 
+###############################################################
+# Run the steps of one cable setup, skipping those already done.
+# Only ask for the cable to be connected if there is work to do.
+def cal_group(done, prompt, steps):
+	todo = [i for i in steps if i[0] not in done]
+	if len(todo) == 0:
+		return
+	pwr_off()
+	p.errors()
+	for i in prompt:
+		print(i)
+	sys.stdin.readline()
+	for name,func,chan in todo:
+		func(chan)
+		done.append(name)
+		fo = open(ckpt_file + ".tmp", "w")
+		json.dump(done, fo)
+		fo.close()
+		os.rename(ckpt_file + ".tmp", ckpt_file)
+
 def calibrate_all():
+	try:
+		done = json.load(open(ckpt_file))
+		print("Resuming, already done: " + " ".join(done))
+	except IOError:
+		done = list()
+
 	pwr_off()
 	pwr("CMODE 1")
-	if True:
-		p.errors()
-		for ch in (1,2,3,4):
-			print("Connect HP34401A(Voltage) to Channel %d" % ch)
-			sys.stdin.readline()
-			if ch < 3:
-				cal_volt_25w(ch)
-			else:
-				cal_volt_50w(ch)
-	if True:
-		p.errors()
-		pwr_off()
-		for ch in (1,2,3,4):
-			print("Connect HP34401A(Current) to Channel %d" % ch)
-			sys.stdin.readline()
-			if ch < 3:
-				cal_amp_25w(ch)
-			else:
-				cal_amp_50w(ch)
-
-	if True:
-		pwr_off()
-		print("Connect HP34401A(Current) to Channel 1 + 2")
-		print("ch1- <--> ch2-, ch2+ <--> dvm+, ch1+ <--> dvm-")
-		sys.stdin.readline()
-		cal_sink_25w(1)
-		cal_sink_25w(2)
-
-	if True:
-		pwr_off()
-		print("Connect HP34401A(Current) to Channel 3 + 4")
-		print("ch3- <--> ch4-, ch4+ <--> dvm+, ch3+ <--> dvm-")
-		sys.stdin.readline()
-		cal_sink_50w(3)
-		cal_sink_50w(4)
+	for ch in (1,2,3,4):
+		if ch < 3:
+			f = cal_volt_25w
+		else:
+			f = cal_volt_50w
+		cal_group(done,
+		    ["Connect HP34401A(Voltage) to Channel %d" % ch],
+		    [("volt%d" % ch, f, ch)])
+
+	for ch in (1,2,3,4):
+		if ch < 3:
+			f = cal_amp_25w
+		else:
+			f = cal_amp_50w
+		cal_group(done,
+		    ["Connect HP34401A(Current) to Channel %d" % ch],
+		    [("amp%d" % ch, f, ch)])
+
+	cal_group(done, [
+		"Connect HP34401A(Current) to Channel 1 + 2",
+		"ch1- <--> ch2-, ch2+ <--> dvm+, ch1+ <--> dvm-"
+	    ], [
+		("sink1", cal_sink_25w, 1),
+		("sink2", cal_sink_25w, 2),
+	    ])
+
+	cal_group(done, [
+		"Connect HP34401A(Current) to Channel 3 + 4",
+		"ch3- <--> ch4-, ch4+ <--> dvm+, ch3+ <--> dvm-"
+	    ], [
+		("sink3", cal_sink_50w, 3),
+		("sink4", cal_sink_50w, 4),
+	    ])
 
 	pwr_off()
 	pwr("CMODE 0")
-	pwr_poll()
 	p.errors()
+	os.remove(ckpt_file)
 
 calibrate_all()
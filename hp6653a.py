@@ -3,16 +3,34 @@
 from __future__ import print_function
 
 import prologix_usb
+import scpi
 
 import time
 import math
 import sys
 
-class hp6653a(prologix_usb.gpib_dev):
+class hp6653a(scpi.scpi, prologix_usb.gpib_dev):
 
 	def __init__(self, name = "gpib1", adr = 12):
 		prologix_usb.gpib_dev.__init__(self, name, adr)
-
+		self.attr("read_tmo_ms", 2000)
+		self.idn_check(None, "6653A")
+		self.id = "HP6653A"
+		self.AOK()
+
+	###############################################################
+	# Voltage, current and operation status (CV=0x100, CC=0x400) as
+	# one element numpy arrays, in one bus exchange.
+	# Same interface as hp6626a.read_all()
+	def read_all(self, max_age=None):
+		import numpy
+		x = self.ask_many(
+		    ["MEAS:VOLT?", ":MEAS:CURR?", ":STAT:OPER:COND?"])
+		return (
+		    numpy.array([float(x[0])]),
+		    numpy.array([float(x[1])]),
+		    numpy.array([int(x[2])], dtype=numpy.int32)
+		)
 
 if __name__ == "__main__":
 
@@ -27,4 +45,4 @@ if __name__ == "__main__":
 	print(d.wr("DISP:TEXT 'HELLO WORLD'"))
 	print(d.ask("DISP:TEXT?"))
 	for i in range(100):
-		print(d.ask("MEAS:CURR?"))
+		print(d.read_all())
@@ -73,6 +73,45 @@ class hp8568b(prologix_usb.gpib_dev):
 			y.append(x[i * 2] * 256 + x[i * 2 + 1])
 		return y
 
+	###############################################################
+	# The n'th graph block (trace) of the screen, see graph_blocks()
+	def screen_trace(self, n=0, min_len=100):
+		return graph_blocks(self.screen_memory(), min_len)[n]
+
+###############################################################
+# Find the graph blocks in screen memory, without rendering it.
+#
+# A graph block is a display control word selecting graph mode,
+# followed by one data word per x position until the next control
+# word.  Returned as a list of numpy float arrays, in memory order,
+# of the blocks of at least min_len points.  Values are display
+# units, 0...1023, with blanked points (> 1023) as NaN.
+#
+# See hp85662a.py for the details of the control words.
+def graph_blocks(ram, min_len=100):
+	import numpy
+	a = numpy.asarray(ram, dtype=numpy.int32)
+	ctl = (a & 0xc00) == 0x400
+	ci = numpy.flatnonzero(ctl)
+	gi = numpy.flatnonzero(ctl & ((a & 0x203) == 0x000))
+	end = ci[numpy.searchsorted(ci, gi, side="right") % len(ci)]
+	end[end <= gi] = len(a)
+	l = list()
+	for g,e in zip(gi, end):
+		if e - g - 1 < min_len:
+			continue
+		y = a[g + 1:e].astype(numpy.float64)
+		y[y > 1023] = numpy.nan
+		l.append(y)
+	return l
+
+###############################################################
+# Display units to dB, given the reference level (top graticule)
+# and the scale.  The top graticule line is at 1001 display units,
+# with 100 units per division.
+def display_db(y, ref=0., db_div=10., top=1001.):
+	return ref - (top - y) * db_div / 100.
+
 if __name__ == "__main__":
 	d=hp8568b()
 	print("Device responds: " + d.ask("ID") + " Rev: " + d.ask("REV"))
@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+#
+# Prologix GPIB-ETHERNET transport
+#
+# This speaks the same "++" protocol as the USB adapter, over TCP
+# port 1234.  Instruments select it by adapter name:
+#
+#	class hp3336c(prologix_usb.gpib_dev):
+#		def __init__(self, name = "tcp:gpib-lan-1", adr = 13):
+#
+# "tcp:host" or "tcp:host:port" are both accepted.
+#
+# Connections are pooled per host:port, so several adapters (or the
+# same one under several names) can be driven from one process.
+# All the names of one adapter share one prologix_lan object, so
+# there is only one idea of its current ++ settings.
+# If a connection drops, it is reopened and the adapter settings
+# are replayed.  A write is then retried, but a read fails, as the
+# reply it was waiting for is lost with the connection.
+#
+
+from __future__ import print_function
+
+import errno
+import select
+import socket
+import threading
+import time
+
+import prologix_usb
+import pylt
+
+port = 1234
+
+ver = "Prologix GPIB-ETHERNET Controller version"
+
+pool = dict()
+
+def tobytes(s):
+	if isinstance(s, bytes):
+		return s
+	return s.encode("latin-1")
+
+def tostr(b):
+	if str is bytes:
+		return b
+	return b.decode("latin-1")
+
+#######################################################################
+# A non-blocking TCP socket, looking enough like serial.Serial for
+# the prologix_usb class: write(), readline(), read() and timeout.
+
+class lan_port(object):
+
+	def __init__(self, host, port):
+		self.host = host
+		self.port = port
+		self.timeout = 0.5
+		self.restore = None
+		self.restoring = False
+		self.sock = None
+		self.buf = b""
+		self.connect()
+
+	def connect(self):
+		s = socket.create_connection((self.host, self.port), 5)
+		s.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+		if hasattr(socket, "TCP_KEEPIDLE"):
+			s.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 10)
+			s.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 5)
+			s.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+		s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		s.setblocking(0)
+		self.sock = s
+		self.buf = b""
+
+	def close(self):
+		if self.sock is not None:
+			self.sock.close()
+		self.sock = None
+
+	###############################################################
+	# Reopen the connection and let the owner restore its state.
+	def reconnect(self):
+		if self.restoring:
+			raise IOError("%s:%d lost during restore" %
+			    (self.host, self.port))
+		self.close()
+		self.connect()
+		if self.restore is None:
+			return
+		self.restoring = True
+		try:
+			self.restore()
+		finally:
+			self.restoring = False
+
+	###############################################################
+	# Has the other end closed on us while we were not looking ?
+	def alive(self):
+		r,w,x = select.select([self.sock], [], [], 0)
+		if len(r) == 0:
+			return True
+		try:
+			b = self.sock.recv(4096)
+		except socket.error as e:
+			if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+				return True
+			return False
+		self.buf += b
+		return len(b) > 0
+
+	def write(self, s):
+		if not self.alive():
+			self.reconnect()
+		b = tobytes(s)
+		while len(b) > 0:
+			select.select([], [self.sock], [], self.timeout)
+			try:
+				n = self.sock.send(b)
+			except socket.error as e:
+				if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+					continue
+				self.reconnect()
+				continue
+			b = b[n:]
+
+	def lost(self):
+		self.reconnect()
+		raise pylt.PyltError("%s:%d" % (self.host, self.port),
+		    "Connection lost during read, reconnected")
+
+	###############################################################
+	# Wait up to the deadline for more data, False if none came.
+	def fill(self, te):
+		dt = te - time.time()
+		if dt < 0:
+			return False
+		r,w,x = select.select([self.sock], [], [], dt)
+		if len(r) == 0:
+			return False
+		try:
+			b = self.sock.recv(4096)
+		except socket.error as e:
+			if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+				return True
+			self.lost()
+		if len(b) == 0:
+			self.lost()
+		self.buf += b
+		return True
+
+	def readline(self):
+		te = time.time() + self.timeout
+		while b"\n" not in self.buf:
+			if not self.fill(te):
+				break
+		i = self.buf.find(b"\n") + 1
+		if i == 0:
+			i = len(self.buf)
+		x = self.buf[:i]
+		self.buf = self.buf[i:]
+		return tostr(x)
+
+	def read(self, n):
+		te = time.time() + self.timeout
+		while len(self.buf) < n:
+			if not self.fill(te):
+				break
+		x = self.buf[:n]
+		self.buf = self.buf[n:]
+		return x
+
+###############################################################
+# "tcp:host" or "tcp:host:port" to (host, port)
+
+def host_port(name):
+	x = name.split(":")
+	assert x[0] == "tcp"
+	if len(x) > 2:
+		return x[1], int(x[2])
+	return x[1], port
+
+###############################################################
+# Get the pooled connection to host:port, opening it if need be
+
+def get_port(host, port):
+	k = "%s:%d" % (host, port)
+	p = pool.get(k)
+	if p is None or p.sock is None:
+		p = lan_port(host, port)
+		pool[k] = p
+	return p
+
+###############################################################
+# The adapter behind a name, shared with any other name for the
+# same host:port, so they do not each keep their own ++addr etc.
+
+adapters = dict()
+
+def adapter(name):
+	k = "%s:%d" % host_port(name)
+	a = adapters.get(k)
+	if a is None or a.ser.sock is None:
+		a = prologix_lan(name)
+		adapters[k] = a
+	prologix_usb.pusb[name] = a
+	return a
+
+#######################################################################
+
+class prologix_lan(prologix_usb.prologix_usb):
+
+	def open(self, name):
+		p = get_port(*host_port(name))
+		p.restore = self.restore
+		return p
+
+	def ver_ok(self, x):
+		return x is not None and x[:len(ver)] == ver
+
+	###############################################################
+	# After a reconnect, the adapter has forgotten nothing (unless
+	# it was power cycled), but we cannot know that, so replay all
+	# the settings we believe it has.
+	def restore(self):
+		self.debug("lan", "reconnected, restoring state")
+		self.reinit()
+		for i in prologix_usb.hwset:
+			if self.curset.get(i) is not None:
+				self.cmd("++" + i + " " + str(self.curset[i]))
+
+#######################################################################
+# A stand-in for a GPIB-ETHERNET box, for testing without hardware.
+# Every device on its bus answers a query "Q?" with "STANDIN <adr> Q?"
+
+class standin(threading.Thread):
+
+	def __init__(self, host="127.0.0.1", port=0):
+		threading.Thread.__init__(self)
+		self.daemon = True
+		self.lsock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.lsock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		self.lsock.bind((host, port))
+		self.lsock.listen(1)
+		self.port = self.lsock.getsockname()[1]
+		self.conn = None
+		self.setting = dict()
+		prologix_usb.def_set(self.setting)
+		self.setting["addr"] = 0
+		self.reply = dict()
+		self.cmds = list()
+
+	def send(self, s):
+		self.conn.sendall(tobytes(s + "\r\n"))
+
+	def cmd(self, s):
+		self.cmds.append(s)
+		a = self.setting["addr"]
+		if s[:2] != "++":
+			if s[-1:] == "?":
+				self.reply[a] = "STANDIN %d %s" % (a, s)
+			return
+		x = s[2:].split()
+		if len(x) == 0:
+			return
+		if x[0] == "ver":
+			self.send(ver + " 01.06.06.00")
+		elif x[0] == "spoll" or x[0] == "srq":
+			self.send("0")
+		elif x[0] == "read":
+			self.send(self.reply.pop(a, ""))
+		elif x[0] in prologix_usb.hwset and len(x) == 1:
+			self.send(str(self.setting[x[0]]))
+		elif x[0] in prologix_usb.hwset:
+			self.setting[x[0]] = int(x[1])
+
+	def drop(self):
+		if self.conn is not None:
+			self.conn.shutdown(socket.SHUT_RDWR)
+
+	def run(self):
+		while True:
+			self.conn,a = self.lsock.accept()
+			b = b""
+			while True:
+				x = self.conn.recv(4096)
+				if len(x) == 0:
+					break
+				b += x.replace(b"\n", b"\r")
+				while b"\r" in b:
+					l,b = b.split(b"\r", 1)
+					self.cmd(tostr(l))
+			self.conn.close()
+			self.conn = None
+
+if __name__ == "__main__":
+	srv = standin()
+	srv.start()
+	d = prologix_usb.gpib_dev("tcp:127.0.0.1:%d" % srv.port, 5)
+	print("Device responds: " + d.ask("*IDN?"))
+	srv.drop()
+	time.sleep(.1)
+	print("After reconnect: " + d.ask("*IDN?"))
+	print("Stand-in settings: " + str(srv.setting))
@@ -7,9 +7,17 @@ import time
 import serial
 import pylt
 import os
+import json
+import atexit
 
 pusb = dict()
 
+# Fast-start: cache adapter version and per-instrument state between
+# runs, and validate the cache with a single "++ver" probe.
+fast_start = False
+cache_file = "_.prologix_cache"
+__cache = None
+
 ver = "Prologix GPIB-USB Controller version 6.107"
 
 hwset = (
@@ -33,19 +41,65 @@ def def_set(setting):
 
 	setting["autocr"] = 1
 
+###############################################################
+# The USB serial number of the adapter behind a device path, if
+# pyserial can tell us, so a re-plugged adapter does not inherit
+# another adapters cached state.
+def usb_serial(name):
+	try:
+		import serial.tools.list_ports
+		rp = os.path.realpath(name)
+		for i in serial.tools.list_ports.comports():
+			if os.path.realpath(i.device) == rp:
+				return i.serial_number
+	except:
+		pass
+	return None
+
+def cache():
+	global __cache
+	if __cache is None:
+		try:
+			__cache = json.load(open(cache_file))
+		except:
+			__cache = dict()
+	return __cache
+
+def cache_save():
+	if __cache is None:
+		return
+	# Write a new file and rename it over the old, so a crash
+	# cannot leave a truncated cache behind
+	fo = open(cache_file + ".tmp", "w")
+	json.dump(__cache, fo, indent=1, sort_keys=True)
+	fo.close()
+	os.rename(cache_file + ".tmp", cache_file)
+
+atexit.register(cache_save)
+
 class prologix_usb(object):
 
-	def __init__(self, name):
+	def __init__(self, name, fast=None):
 		self.name = name
-                # Create logfile
-                log_file = "_." + name.replace(os.path.sep, '_')
+		# Create logfile
+		log_file = "_." + name.replace(os.path.sep, '_').replace(":", "_")
 		self.debug_fd = open(log_file, "w")
 		self.debug("====", "=============================")
 
-		self.ser = serial.Serial(name, 115200, timeout = 0.5)
-		self.version_check()
+		if fast is None:
+			fast = fast_start
+		self.fast = fast
+		self.ser = self.open(name)
 		self.curset = dict()
-		self.rd_settings()
+		self.cache_key = name + "|" + str(usb_serial(name))
+		if not fast or not self.fast_check():
+			self.version_check()
+			self.rd_settings()
+			self.cache = dict()
+			self.cache["ver"] = self.version
+			self.cache["dev"] = dict()
+			if fast:
+				cache()[self.cache_key] = self.cache
 		d = dict()
 		def_set(d)
 		self.set(d)
@@ -56,18 +110,56 @@ class prologix_usb(object):
 		    file=self.debug_fd)
 		self.debug_fd.flush()
 
-	def version_check(self):
+	###############################################################
+	# Open the port the "++" protocol runs over
+	def open(self, name):
+		return serial.Serial(name, 115200, timeout = 0.5)
+
+	def ver_ok(self, x):
+		return x == ver
+
+	###############################################################
+	# Put the adapter in controller mode, with nothing pending
+	def reinit(self):
 		self.ser.write("\r")
 		self.cmd("++mode 1")
 		self.cmd("++auto 0")
 		self.cmd("++addr 0")
 		self.cmd("++savecfg 0")
 		self.cmd("++ifc")
+
+	def version_check(self):
+		self.reinit()
 		while True:
 			x = self.ask("++ver")
-			if x == ver:
+			if self.ver_ok(x):
 				break;
-		assert x == ver
+		assert self.ver_ok(x)
+		self.version = x
+
+	###############################################################
+	# Skip the handshake if the adapter answers the version probe
+	# in one go, otherwise let the caller do the full handshake.
+	# The ++ settings are not cached: the adapter may have been power
+	# cycled or reconfigured by other software, so they are marked
+	# unknown and set() writes them all, which needs no replies.
+	def fast_check(self):
+		c = cache().get(self.cache_key)
+		if c is None or not self.ver_ok(c.get("ver")):
+			return False
+		self.reinit()
+		if self.ask("++ver") != c["ver"]:
+			self.debug("fast", "version probe failed")
+			return False
+		self.version = c["ver"]
+		self.cache = c
+		for i in hwset:
+			self.curset[i] = None
+		# As left by reinit()
+		self.curset["auto"] = "0"
+		self.curset["addr"] = "0"
+		self.debug("fast", "using cached version")
+		return True
 
 	def ask(self, str):
 		self.cmd(str)
@@ -97,6 +189,20 @@ class prologix_usb(object):
 		self.debug("<%d<" % chr,  x)
 		return (x)
 
+	###############################################################
+	# The next line of a message the adapter is already sending, ""
+	# if none comes within tmo seconds.  No "++read", which would
+	# make the adapter wait read_tmo_ms on a silent instrument.
+	def rd_pending(self, tmo=0.05):
+		t = self.ser.timeout
+		self.ser.timeout = tmo
+		try:
+			x = self.ser.readline()
+		finally:
+			self.ser.timeout = t
+		self.debug("<pend<",  x)
+		return (x)
+
 	def rd_bin(self, nbr, eoi = True):
 		if eoi:
 			self.cmd("++read eoi")
@@ -107,11 +213,34 @@ class prologix_usb(object):
 		self.debug("<%d/%d<" % (nbr, len(x)),  x)
 		return (x)
 
+	###############################################################
+	# Read an "#A" block: two bytes of length, big-endian, and that
+	# many bytes of data, all in one read.
+	def rd_block(self):
+		self.cmd("++read eoi")
+		h = bytearray(self.ser.read(4))
+		assert h[:2] == bytearray(b"#A")
+		n = (h[2] << 8) | h[3]
+		x = bytearray(self.ser.read(n))
+		self.debug("<#A%d/%d<" % (n, len(x)),  x)
+		return (x)
+
 	def wr(self, str):
 		assert str[0:2] != "++"
 		self.debug(">", str)
 		self.ser.write(str + "\r")
 
+	###############################################################
+	# Write binary data, CR, LF, ESC and '+' must be escaped
+	def wr_bin(self, b):
+		x = bytearray()
+		for c in bytearray(b):
+			if c in (10, 13, 27, 43):
+				x.append(27)
+			x.append(c)
+		self.debug(">bin>", x)
+		self.ser.write(bytes(x) + b"\r")
+
 	def set(self, settings):
 		for i in hwset:
 			if i not in settings:
@@ -133,6 +262,22 @@ class prologix_usb(object):
 				break
 		return(int(a))
 
+	###############################################################
+	# Poll several addresses in one pass: the "++spoll addr" form
+	# does not touch the current address, so all the polls are sent
+	# back to back and the replies collected afterwards.
+	def spoll_list(self, addrs):
+		addrs = list(addrs)
+		for i in addrs:
+			self.cmd("++spoll %d" % i)
+		r = dict()
+		while len(r) < len(addrs):
+			a = self.ser.readline()
+			self.debug("<sp<", a)
+			if a.strip().isdigit():
+				r[addrs[len(r)]] = int(a)
+		return r
+
 	def trigger(self):
 		self.cmd("++trg")
 
@@ -142,7 +287,10 @@ class prologix_usb(object):
 class gpib_dev(pylt.pylt):
 
 	def __init__(self, name, adr):
-		if not name in pusb:
+		if not name in pusb and name[:4] == "tcp:":
+			import prologix_lan
+			x = prologix_lan.adapter(name)
+		elif not name in pusb:
 			x = prologix_usb(name)
 
 		self.pusb = pusb[name]
@@ -153,6 +301,23 @@ class gpib_dev(pylt.pylt):
 		def_set(self.setting)
 		self.setting["addr"] = adr
 
+	###############################################################
+	# Per-instrument fast-start state, kept with the adapter cache.
+	# Returns the cached value, or None if not fast-starting or not
+	# cached.  The driver is expected to validate it cheaply (ID?)
+	def cache_get(self, key):
+		if not self.pusb.fast:
+			return None
+		d = self.pusb.cache["dev"].get(str(self.setting["addr"]))
+		if d is None:
+			return None
+		return d.get(key)
+
+	def cache_put(self, key, val):
+		if not self.pusb.fast:
+			return
+		a = str(self.setting["addr"])
+		self.pusb.cache["dev"].setdefault(a, dict())[key] = val
 
 	def wr(self, str):
 		self.pusb.set(self.setting)
@@ -177,6 +342,14 @@ class gpib_dev(pylt.pylt):
 		x = self.pusb.rd_bin(cnt)
 		return (x)
 
+	def rd_block(self, tmo=None, fail=True):
+		self.pusb.set(self.setting)
+		return self.pusb.rd_block()
+
+	def wr_bin(self, b):
+		self.pusb.set(self.setting)
+		self.pusb.wr_bin(b)
+
 	def rd(self, tmo=None, fail=True):
 		m = self.setting["rd_mode"]
 		if m == "eoi":
@@ -184,6 +357,18 @@ class gpib_dev(pylt.pylt):
 		else:
 			return self.rd_chr(m)
 
+	###############################################################
+	# The rest of a reply with CR/LF inside one EOI message is in
+	# the host buffer after the first line has been read.
+	def rd_more(self, tmo=None):
+		x = self.pusb.rd_pending()
+		if x == "":
+			x = self.rd(tmo=tmo)
+		return x
+
+	def bus(self):
+		return self.pusb.ser
+
 	def attr(self, name, val):
 		self.setting[name] = val
 
@@ -191,6 +376,20 @@ class gpib_dev(pylt.pylt):
 		self.pusb.set(self.setting)
 		return(self.pusb.spoll())
 
+	###############################################################
+	# Poll all the devices which share our adapter in one pass,
+	# leave the rest for somebody else.
+	def spoll_many(self, devs):
+		l = [i for i in devs
+		    if isinstance(i, gpib_dev) and i.pusb == self.pusb]
+		self.pusb.set(self.setting)
+		x = self.pusb.spoll_list(
+		    [i.setting["addr"] for i in l])
+		r = dict()
+		for i in l:
+			r[i] = x[i.setting["addr"]]
+		return r
+
 	def trigger(self):
 		self.pusb.set(self.setting)
 		return(self.pusb.trigger())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#
+# Periodic logging of power supply readings
+#
+# Works with any device which has a read_all() method returning
+# numpy arrays of (volts, amps, status), one element per channel,
+# such as the hp6626a and hp6653a.
+#
+# The log is a readings_store with the columns t, and v<n>, i<n>
+# and s<n> for each channel n = 1, 2, ...
+#
+# Usage is:
+#	p = hp6626a.hp6626a()
+#	s = psu_sampler.sampler(p, "_.psu")
+#	s.run(interval=.1, count=36000)
+#	t,v,i,s = psu_sampler.load("_.psu")
+#
+
+from __future__ import print_function
+
+import time
+
+import numpy
+
+import readings_store
+
+class sampler(object):
+
+	def __init__(self, dev, fname, chunk=100):
+		self.dev = dev
+		self.fname = fname
+		self.chunk = chunk
+		self.store = None
+		self.buf = list()
+
+	def open(self, nchan):
+		c = list()
+		for x,ty in (("v", "f8"), ("i", "f8"), ("s", "i4")):
+			for j in range(1, nchan + 1):
+				c.append(("%s%d" % (x, j), ty))
+		self.store = readings_store.store(self.fname, columns=c,
+		    id=self.dev.id, nchan=nchan)
+
+	###############################################################
+	# Take one sample of all channels, it is written to the log
+	# once "chunk" samples have been collected.
+	def sample(self):
+		t = time.time()
+		v,i,s = self.dev.read_all()
+		if self.store is None:
+			self.open(len(v))
+		self.buf.append((t, v, i, s))
+		if len(self.buf) >= self.chunk:
+			self.flush()
+		return t,v,i,s
+
+	def flush(self):
+		if len(self.buf) == 0:
+			return
+		c = dict()
+		for n,x in enumerate(("v", "i", "s")):
+			a = numpy.array([b[n + 1] for b in self.buf])
+			for j in range(a.shape[1]):
+				c["%s%d" % (x, j + 1)] = a[:,j]
+		self.store.append([b[0] for b in self.buf], **c)
+		self.buf = list()
+
+	###############################################################
+	# Write out the samples not yet in the log, call this when done
+	# if sample() is used directly.
+	def close(self):
+		self.flush()
+		self.store = None
+
+	###############################################################
+	# Sample every interval seconds (on a fixed grid, so the time
+	# spent talking to the instrument does not add up), for count
+	# samples or forever.
+	def run(self, interval=1., count=None):
+		n = 0
+		tn = time.time()
+		try:
+			while count is None or n < count:
+				self.sample()
+				n += 1
+				tn += interval
+				dt = tn - time.time()
+				if dt > 0:
+					time.sleep(dt)
+		finally:
+			self.close()
+
+###############################################################
+# Read a log back as numpy arrays: t[n], v[n,chan], i[n,chan], s[n,chan]
+def load(fname):
+	r = readings_store.store(fname)
+	nchan = r.meta()["nchan"]
+	d = r.data()
+	l = [d["t"]]
+	for x in ("v", "i", "s"):
+		l.append(numpy.column_stack(
+		    [d["%s%d" % (x, j)] for j in range(1, nchan + 1)]))
+	return l
@@ -8,6 +8,8 @@
 # Timeout arguments are always named "tmo" and have units of milliseconds.
 #
 
+import contextlib
+import re
 import sys
 import time
 
@@ -72,9 +74,98 @@ class pylt(object):
 		self.wr(q)
 		return self.rd(tmo=tmo, fail=fail)
 
+	###############################################################
+	# Ask several questions in one compound command, for instruments
+	# which accept "Q1;Q2;Q3" and answer with "A1;A2;A3", on one or
+	# more lines, or with CR/LF between them.  Returns the list of
+	# answers.
+	def ask_many(self, qs, sep=";", tmo=None):
+		self.wr(sep.join(qs))
+		r = list()
+		while len(r) < len(qs):
+			if len(r) == 0:
+				x = self.rd(tmo=tmo)
+			else:
+				x = self.rd_more(tmo=tmo)
+			x = x.strip()
+			if x == "":
+				self.fail("Timeout after %d of %d answers to %s" %
+				    (len(r), len(qs), sep.join(qs)))
+			r.extend([i.strip() for i in
+			    re.split("[" + re.escape(sep) + "\r\n]+", x)])
+		if len(r) != len(qs):
+			self.fail("%d answers to %d questions: %s" %
+			    (len(r), len(qs), sep.join(r)))
+		return r
+
+	###############################################################
+	# Read the next line of an answer.  Transports which may already
+	# have it, from the read which got the line before, override this
+	# to use it rather than start another read.
+	def rd_more(self, tmo=None):
+		return self.rd(tmo=tmo)
+
 	###############################################################
 	# Raise exception if the instrument reports errors
+	#
+	# How often errors are actually checked is set by the error
+	# policy, see error_policy() below.
+	#
+	err_policy = "immediate"
+	err_n = 1
+	err_count = 0
+	# spoll() bit(s) which show there are errors to report, if any
+	spoll_err = 0x00
+
 	def AOK(self):
+		p = self.err_policy
+		if p == "batch":
+			return
+		if p == "every":
+			self.err_count += 1
+			if self.err_count < self.err_n:
+				return
+			self.err_count = 0
+		# Poll now, a status byte from before the commands being
+		# checked would report their errors late
+		if p == "status" and self.spoll_err:
+			if not self.spoll() & self.spoll_err:
+				return
+		if self.errors():
+			self.fail('Instrument reported errors')
+
+	###############################################################
+	# Change how AOK() checks for errors, for the duration of a
+	# "with" block:
+	#
+	#	"immediate"	every time (the default)
+	#	"every"		every n'th time
+	#	"status"	only if the spoll_err bit is set in the
+	#			status byte, one serial poll instead of
+	#			the errors() query
+	#	"batch"		not at all
+	#
+	# Errors are always checked when the block completes normally,
+	# if it raised, that exception is passed on unchanged.
+	#
+	# Usage is:
+	#	with d.error_policy("every", 100):
+	#		for f in freqs:
+	#			d.set_freq(f)
+	#
+	@contextlib.contextmanager
+	def error_policy(self, policy, n=1):
+		assert policy in ("immediate", "every", "status", "batch")
+		old = (self.err_policy, self.err_n, self.err_count)
+		self.err_policy = policy
+		self.err_n = n
+		self.err_count = 0
+		try:
+			yield self
+		finally:
+			self.err_policy, self.err_n, self.err_count = old
+		# Not reached if the block raised, which must not be
+		# replaced by the exception from this check
 		if self.errors():
 			self.fail('Instrument reported errors')
 
@@ -96,34 +187,32 @@ class pylt(object):
 		sys.stderr.write(
 		    "PYLT.WARN: [%s].trigger() undefined\n" % self.id)
 
+	###############################################################
+	# Identify the bus we talk over.  Devices returning the same
+	# bus can not be talked to at the same time, see bus_engine.py
+	def bus(self):
+		return self
+
 	def spoll(self):
 		sys.stderr.write(
 		    "PYLT.WARN: [%s].spoll() undefined\n" % self.id)
 		return 0
 
+	###############################################################
+	# Serial poll a list of devices, return dict of status bytes.
+	# Buses which can poll many addresses in one pass override this.
+	def spoll_many(self, devs):
+		r = dict()
+		for i in devs:
+			r[i] = i.spoll()
+		return r
+
 	###############################################################
 	# Wait for a bits to turn on in spoll()
 	#
 	def wait_spoll(self, bits, tmo = 10000.):
 		self.debug("SPOLL WAITING FOR %02x" % bits)
-		assert bits > 0 or "wait_spoll bits" == "must > 0"
-		assert bits < 256 or "wait_spoll bits" == "must be < 256"
-		obits = 256
-		te = time.time() + tmo * 1e-3
-		x = 0
-		dt = 0.001
-		while time.time() < te:
-			x = self.spoll()
-			if x != obits:
-				self.debug("SPOLL CHG %02x -> %02x" %
-				    (obits, x))
-				obits = x
-			if x & bits:
-				return True
-			time.sleep(dt)
-			if dt < 3:
-				dt += dt
-		return False
+		return len(wait_spoll_any({self: bits}, tmo)) > 0
 
 	###############################################################
 	# Wait until instrument is ready.
@@ -146,3 +235,46 @@ class pylt(object):
 		if not fail:
 			return False
 		self.fail("Timeout waiting for data")
+
+###############################################################
+# Wait for bits to turn on in spoll() of any of several devices.
+#
+# devs is a dict of {device: bits}.
+# Returns the list of devices which have their bits set, the list
+# is empty if the timeout expired.
+#
+def wait_spoll_any(devs, tmo = 10000.):
+	for d,bits in devs.items():
+		assert bits > 0 or "wait_spoll bits" == "must > 0"
+		assert bits < 256 or "wait_spoll bits" == "must be < 256"
+	obits = dict()
+	te = time.time() + tmo * 1e-3
+	dt = 0.001
+	while time.time() < te:
+		r = list()
+		for d,x in spoll_all(devs.keys()).items():
+			if x != obits.get(d, 256):
+				d.debug("SPOLL CHG %02x -> %02x" %
+				    (obits.get(d, 256), x))
+				obits[d] = x
+			if x & devs[d]:
+				r.append(d)
+		if len(r) > 0:
+			return r
+		time.sleep(dt)
+		if dt < 3:
+			dt += dt
+	return []
+
+###############################################################
+# Serial poll several devices, possibly on different buses.
+# Each device class gets to poll its own kind in bulk.
+#
+def spoll_all(devs):
+	r = dict()
+	devs = list(devs)
+	while len(devs) > 0:
+		x = devs[0].spoll_many(devs)
+		r.update(x)
+		devs = [i for i in devs if i not in x]
+	return r
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+#
+# An append-only, columnar store for readings
+#
+# A store is a directory with one raw binary file per column, and a
+# "meta.json" which lists the columns, free-form metadata (instrument,
+# units, ...) and how many rows and chunks have been appended so far:
+#
+#	t.f8	float64 timestamps, seconds since the epoch, ascending
+#	v.f8	float64 readings (unless other columns are asked for)
+#	<name>.<type>	any further per-reading columns (freq, chan, ...)
+#	chunks.idx	float64 triplets, first row, first and last
+#			timestamp of each chunk appended
+#
+# Columns are memory-mapped for queries, and the chunk index narrows
+# time-range lookups down to a binary search within a single chunk.
+#
+# meta.json is rewritten last on every append, and is what counts:
+# anything in the other files beyond its row and chunk counts was
+# left by a crash in the middle of an append, and is overwritten by
+# the next one.
+#
+# Usage is:
+#	s = readings_store.store("_.log", units="V", id=d.id)
+#	s.append(t, v)
+#	...
+#	r = readings_store.store("_.log")
+#	x = r.between(t0, t1)
+#	plot(x["t"], x["v"])
+#	r.export_hp3478a("_.log.txt")
+#
+
+from __future__ import print_function
+
+import json
+import os
+import time
+
+import numpy
+
+###############################################################
+# Write the array a at row "row" of the file, dropping anything
+# after it, so a torn earlier write cannot misalign the rows.
+def write_rows(fname, row, a):
+	if os.path.exists(fname):
+		fo = open(fname, "r+b")
+	else:
+		fo = open(fname, "wb")
+	fo.seek(row * a[:1].nbytes)
+	fo.truncate()
+	a.tofile(fo)
+	fo.close()
+
+class store(object):
+
+	###############################################################
+	# Open a store, creating it if need be.  The columns besides "t"
+	# and their numpy types can be given when creating, keyword
+	# arguments are kept as metadata.
+	def __init__(self, dirname, columns=(("v", "f8"),), **meta):
+		self.dirname = dirname
+		self.fmeta = os.path.join(dirname, "meta.json")
+		if os.path.exists(self.fmeta):
+			self.h = json.load(open(self.fmeta))
+			if len(meta) > 0:
+				self.h["meta"].update(meta)
+				self.save()
+		else:
+			if not os.path.isdir(dirname):
+				os.makedirs(dirname)
+			c = [["t", "f8"]]
+			for n,t in columns:
+				c.append([n, numpy.dtype(t).str[1:]])
+			self.h = {
+				"columns": c,
+				"chunks": 0,
+				"rows": 0,
+				"meta": meta,
+			}
+			self.save()
+		self.mm = None
+		self.ch = None
+
+	###############################################################
+	# Pick up chunks appended by somebody else since we opened it
+	def reload(self):
+		self.h = json.load(open(self.fmeta))
+		self.mm = None
+		self.ch = None
+
+	def save(self):
+		fo = open(self.fmeta + ".tmp", "w")
+		json.dump(self.h, fo, indent=1)
+		fo.close()
+		os.rename(self.fmeta + ".tmp", self.fmeta)
+
+	def fname(self, n, t):
+		return os.path.join(self.dirname, n + "." + t)
+
+	def fchunks(self):
+		return os.path.join(self.dirname, "chunks.idx")
+
+	def put_chunks(self, n, l):
+		a = numpy.array(l, dtype="<f8").reshape(-1, 3)
+		write_rows(self.fchunks(), n, a)
+
+	###############################################################
+	# The chunk index, one row of (first row, first t, last t) each
+	def chunks(self):
+		if self.ch is not None:
+			return self.ch
+		n = self.h["chunks"]
+		if n == 0:
+			self.ch = numpy.zeros((0, 3))
+		else:
+			self.ch = numpy.memmap(self.fchunks(), dtype="<f8",
+			    mode="r", shape=(n, 3))
+		return self.ch
+
+	def columns(self):
+		return [n for n,t in self.h["columns"]]
+
+	def meta(self):
+		return self.h["meta"]
+
+	def __len__(self):
+		return self.h["rows"]
+
+	###############################################################
+	# Append a chunk of readings.  All columns must be given, and
+	# the timestamps must not go backwards.
+	def append(self, t, v=None, **cols):
+		t = numpy.asarray(t, dtype="<f8")
+		n = len(t)
+		if n == 0:
+			return
+		ch = self.chunks()
+		assert len(ch) == 0 or t[0] >= ch[-1][2]
+		cols["t"] = t
+		if v is not None:
+			cols["v"] = v
+		r = self.h["rows"]
+		for c,ty in self.h["columns"]:
+			a = numpy.asarray(cols[c], dtype="<" + ty)
+			assert len(a) == n
+			write_rows(self.fname(c, ty), r, a)
+		self.put_chunks(self.h["chunks"], [r, t[0], t[-1]])
+		self.h["rows"] += n
+		self.h["chunks"] += 1
+		self.save()
+		self.mm = None
+		self.ch = None
+
+	###############################################################
+	# Memory-mapped columns, as a dict of numpy arrays
+	def data(self):
+		if self.mm is not None:
+			return self.mm
+		self.mm = dict()
+		n = self.h["rows"]
+		for c,ty in self.h["columns"]:
+			if n == 0:
+				self.mm[c] = numpy.zeros(0, dtype="<" + ty)
+			else:
+				self.mm[c] = numpy.memmap(self.fname(c, ty),
+				    dtype="<" + ty, mode="r", shape=(n,))
+		return self.mm
+
+	###############################################################
+	# Row number of the first reading at or after time t
+	def row(self, t):
+		ch = self.chunks()
+		# Chunk index: first chunk which ends at or after t
+		lo = int(numpy.searchsorted(ch[:, 2], t))
+		if lo == len(ch):
+			return self.h["rows"]
+		r0 = int(ch[lo][0])
+		if lo + 1 < len(ch):
+			r1 = int(ch[lo + 1][0])
+		else:
+			r1 = self.h["rows"]
+		ts = self.data()["t"]
+		return r0 + int(numpy.searchsorted(ts[r0:r1], t))
+
+	###############################################################
+	# The readings with t0 <= t < t1, as a dict of array views
+	def between(self, t0=None, t1=None):
+		d = self.data()
+		if t0 is None:
+			r0 = 0
+		else:
+			r0 = self.row(t0)
+		if t1 is None:
+			r1 = self.h["rows"]
+		else:
+			r1 = self.row(t1)
+		x = dict()
+		for c in d:
+			x[c] = d[c][r0:r1]
+		return x
+
+	###############################################################
+	# Exporters to the text formats the individual scripts write
+
+	# Whitespace separated columns, like freq_amp_flatness.py
+	def export_text(self, fname, columns=None, fmt="%e", t0=None, t1=None):
+		if columns is None:
+			columns = self.columns()
+		x = self.between(t0, t1)
+		a = numpy.column_stack([x[c] for c in columns])
+		numpy.savetxt(fname, a, fmt=fmt, delimiter=" ")
+
+	# hp3478a.write_results() format
+	def export_hp3478a(self, fname, units=None, t0=None, t1=None):
+		x = self.between(t0, t1)
+		t = x["t"]
+		v = x["v"]
+		fo = open(fname, "w")
+		unit = ""
+		if units is None:
+			units = self.h["meta"].get("units")
+		if units:
+			unit = " (" + units + ")"
+		fo.write("# reading #, datetime, time since first reading (secs), measurement" + unit + "\n")
+		if len(t) > 0:
+			dt_width = len(str(t[-1] - t[0]))
+			index_width = len(str(len(t)))
+			for i in range(len(t)):
+				fo.write("{0:0{index_width}d} {1} {2:0{dt_width}.1f} {3:+.5f}\n".format(
+				    i, time.strftime("%Y-%m-%dT%H:%M:%S",
+				    time.gmtime(t[i])), t[i] - t[0], v[i],
+				    index_width=index_width, dt_width=dt_width))
+		fo.close()
+
+	# hp3458a voltlog() format, tc is the start of the calibration
+	# interval, defaulting to the first reading.
+	def export_voltlog(self, fname, tc=None, t0=None, t1=None):
+		x = self.between(t0, t1)
+		t = x["t"]
+		v = x["v"]
+		fo = open(fname, "w")
+		if len(t) > 0:
+			if tc is None:
+				tc = t[0]
+			for i in range(len(t)):
+				fo.write("%.3f %10.3f %10.3f %+.9E\n" %
+				    (t[i], t[i] - t[0], t[i] - tc, v[i]))
+		fo.close()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+#
+# Common SCPI instrument methods
+#
+# A mixin for drivers of SCPI instruments, to be listed before the
+# transport class:
+#
+#	class hp34401a(scpi.scpi, prologix_usb.gpib_dev):
+#		commands = {
+#			"volt": "CONF:VOLT:DC %g,%g",
+#		}
+#		def __init__(self, name = "gpib1", adr = 21):
+#			prologix_usb.gpib_dev.__init__(self, name, adr)
+#			self.idn_check("HEWLETT-PACKARD", "34401A")
+#
+# It provides *IDN? checking, errors() from SYST:ERR?, reset(), and
+# commands from the class' "commands" table of templates, which are
+# compiled once per class:
+#
+#	d.cmd("volt", 10, 1e-6)
+#
+# Inside a batch, commands are not sent one by one but joined with
+# ";" into as few bus writes as possible, and the errors are checked
+# once at the end of the batch:
+#
+#	with d.batch():
+#		d.cmd("volt", 10, 1e-6)
+#		d.wr("TRIG:SOUR BUS")
+#
+
+from __future__ import print_function
+
+import contextlib
+import sys
+
+###############################################################
+# Compile a command table, {name: template}, into functions making
+# the command string from the arguments.
+def compile_commands(commands):
+	t = dict()
+	for n,f in commands.items():
+		if "%" in f:
+			t[n] = f.__mod__
+		else:
+			t[n] = lambda x, f=f: f
+	return t
+
+class scpi(object):
+
+	commands = dict()
+
+	# Longest compound command sent in a batch
+	batch_len = 200
+
+	###############################################################
+	# Ask *IDN? and fail unless it is the expected instrument.
+	# Sets self.id to the model, returns the *IDN? fields.
+	def idn_check(self, man, model):
+		x = [i.strip() for i in self.ask("*IDN?").split(",")]
+		if len(x) < 2 or (man is not None and x[0] != man) or \
+		    model not in x[1]:
+			self.fail("%s ID Failure (%s)" % (model, x))
+		self.id = x[1]
+		return x
+
+	#######################
+	# PYLT Standard methods
+	#######################
+
+	def errors(self, f=sys.stderr):
+		r = False
+		while True:
+			x = self.ask("SYST:ERR?").strip()
+			if x == "":
+				self.fail("No answer to SYST:ERR?")
+			if int(x.split(",")[0]) == 0:
+				break
+			f.write(self.id + ".ERROR: " +  x + "\n")
+			r = True
+		return r
+
+	def reset(self):
+		self.wr("*RST")
+		self.AOK()
+
+	###############################################################
+	# Commands from the template table
+
+	def template(self, name):
+		c = self.__class__
+		if c.__dict__.get("_compiled") is None:
+			c._compiled = compile_commands(c.commands)
+		return c._compiled[name]
+
+	def cmd(self, name, *args):
+		self.wr(self.template(name)(tuple(args)))
+
+	###############################################################
+	# Batching
+
+	batched = None
+
+	def wr(self, s, *args, **kw):
+		if self.batched is not None:
+			self.batched.append(s)
+		else:
+			super(scpi, self).wr(s, *args, **kw)
+
+	# A query ends the compound command, as the answer is needed now
+	@contextlib.contextmanager
+	def unbatched(self):
+		if self.batched is None:
+			yield
+			return
+		self.send()
+		try:
+			yield
+		finally:
+			self.batched = list()
+
+	def ask(self, q, tmo=None, fail=True):
+		with self.unbatched():
+			return super(scpi, self).ask(q, tmo=tmo, fail=fail)
+
+	def ask_many(self, qs, sep=";", tmo=None):
+		with self.unbatched():
+			return super(scpi, self).ask_many(qs, sep=sep, tmo=tmo)
+
+	###############################################################
+	# Send the batched commands joined into compound commands.  Each
+	# one after the first is made absolute with a leading ":", so
+	# it does not depend on the path left by the one before.
+	def send(self):
+		b = self.batched
+		self.batched = None
+		s = ""
+		for i in b:
+			if s != "" and i[0] not in ":*":
+				i = ":" + i
+			if s != "" and len(s) + len(i) >= self.batch_len:
+				self.wr(s)
+				s = ""
+			if s == "":
+				s = i
+			else:
+				s += ";" + i
+		if s != "":
+			self.wr(s)
+
+	@contextlib.contextmanager
+	def batch(self):
+		if self.batched is not None:
+			# Already batching, join the outer batch
+			yield self
+			return
+		self.batched = list()
+		try:
+			yield self
+		except:
+			self.batched = None
+			raise
+		self.send()
+		self.AOK()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+#
+# Wait for a reading to settle, instead of sleeping a fixed time.
+#
+# Readings are taken until the last "window" of them pass a test:
+#
+#	"slope"	the least squares drift across the window is less
+#		than tol
+#	"var"	the standard deviation of the window is less than tol
+#
+# Timeouts are in milliseconds, as everywhere in PYLT.
+#
+# Usage is:
+#	x = settle.settle(settle.reader(dvm), 1e-6)
+# or
+#	x = settle.settle(settle.reader(psu, "VOUT? 1"), 1e-3, test="var")
+#
+
+from __future__ import print_function
+
+import time
+
+import pylt
+
+###############################################################
+# Make a reading function from a pylt device, which either talks
+# by itself (q=None) or answers a query.
+
+def reader(dev, q=None):
+	if q is None:
+		return lambda: float(dev.rd())
+	return lambda: float(dev.ask(q))
+
+def slope(w):
+	n = len(w)
+	tm = sum([t for t,x in w]) / n
+	xm = sum([x for t,x in w]) / n
+	a = sum([(t - tm) * (x - xm) for t,x in w])
+	b = sum([(t - tm) ** 2 for t,x in w])
+	if b == 0:
+		return 0.
+	return a / b
+
+def drift(w):
+	return abs(slope(w) * (w[-1][0] - w[0][0]))
+
+def stddev(w):
+	n = len(w)
+	xm = sum([x for t,x in w]) / n
+	return (sum([(x - xm) ** 2 for t,x in w]) / n) ** .5
+
+tests = {
+	"slope": drift,
+	"var": stddev,
+}
+
+###############################################################
+# Take readings until settled, and return the last one.
+#
+# read is a function returning a float, or an iterator of floats.
+# interval is the minimum time between readings, in seconds.
+#
+# If fail is True, raise an exception on timeout, else return a
+# tuple as rd() does: (True, reading) or (False, last reading).
+#
+def settle(read, tol, window=5, test="slope", tmo=60000, interval=0.,
+    fail=True):
+	if not callable(read):
+		it = iter(read)
+		read = lambda: next(it)
+	f = tests[test]
+	w = list()
+	te = time.time() + tmo * 1e-3
+	x = None
+	while time.time() < te:
+		t = time.time()
+		x = read()
+		w.append((t, x))
+		if len(w) > window:
+			w.pop(0)
+		if len(w) == window and f(w) < tol:
+			if fail:
+				return x
+			return (True, x)
+		dt = t + interval - time.time()
+		if dt > 0:
+			time.sleep(dt)
+	if fail and len(w) < window:
+		raise pylt.PyltError("settle", "Timeout, too few readings")
+	if fail:
+		raise pylt.PyltError("settle",
+		    "Timeout, %s = %g > %g" % (test, f(w), tol))
+	return (False, x)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+#
+# Declarative multi-dimensional measurement sweeps
+#
+# A sweep is a list of axes, outermost first, each with its values,
+# a function to set it and the time it takes to settle after being
+# changed.  The point list is computed up front, so a sweep which
+# crashes can be resumed from a checkpoint file.  The checkpoint
+# file is removed when the sweep completes.
+#
+# Measurements are split in two: measure() which must happen with
+# the point settled, and an optional fetch() which merely reads the
+# result back.  The next point is set up in a separate thread while
+# fetch() runs, and its settling time counts from when it was set,
+# so settling overlaps with readback and writing the results.
+# This only works if fetch() and the setters use different buses.
+#
+# Instead of a time, settle can be a function which returns when
+# the axis has settled, for instance using settle.settle().
+#
+# Usage is:
+#	s = sweep.sweep([
+#		sweep.axis("amp", sweep.linstep(-30, 7, 3), g.set_dbm, 10),
+#		sweep.axis("freq", sweep.logstep(9e3, 21e6, 2), g.set_freq, 1),
+#	    ], m.measure, fname="_.sweep", checkpoint="_.sweep.ckpt")
+#	for p,x in s.run():
+#		print(p["freq"], p["amp"], x)
+#
+
+from __future__ import print_function
+
+import itertools
+import json
+import os
+import threading
+import time
+
+###############################################################
+# Value generators matching the usual "while x < hi" loops
+
+def linstep(lo, hi, step):
+	l = list()
+	x = lo
+	while x < hi:
+		l.append(x)
+		x += step
+	return l
+
+def logstep(lo, hi, factor):
+	l = list()
+	x = lo
+	while x < hi:
+		l.append(x)
+		x *= factor
+	return l
+
+class axis(object):
+	def __init__(self, name, values, set=None, settle=0.):
+		self.name = name
+		self.values = list(values)
+		self.set = set
+		self.settle = settle
+
+class sweep(object):
+
+	def __init__(self, axes, measure, fetch=None, setup=None,
+	    fname=None, checkpoint=None, fmt=None):
+		self.axes = axes
+		self.measure = measure
+		self.fetch = fetch
+		self.setup = setup
+		self.fname = fname
+		self.checkpoint = checkpoint
+		if fmt is None:
+			fmt = self.fmt
+		self.format = fmt
+		self.cur = dict()
+		self.te = 0
+		self.thr = None
+		self.exc = None
+
+	###############################################################
+	# All the points, in the order they will be measured
+	def points(self):
+		l = list()
+		for v in itertools.product(*[a.values for a in self.axes]):
+			p = dict()
+			for a,x in zip(self.axes, v):
+				p[a.name] = x
+			l.append(p)
+		return l
+
+	def fmt(self, p, x):
+		s = ""
+		for a in self.axes:
+			s += "%e " % p[a.name]
+		if isinstance(x, (tuple, list)):
+			s += " ".join(["%e" % i for i in x])
+		else:
+			s += "%e" % x
+		return s
+
+	###############################################################
+	# Set the axes which changed, outermost first, and note when
+	# the point will have settled.
+	def set_point(self, p):
+		t = time.time()
+		for a in self.axes:
+			if self.cur.get(a.name) == p[a.name]:
+				continue
+			if a.set is not None:
+				a.set(p[a.name])
+			self.cur[a.name] = p[a.name]
+			if callable(a.settle):
+				a.settle()
+			else:
+				self.te = max(self.te, t + a.settle)
+		if self.setup is not None:
+			self.setup(p)
+
+	def set_bg(self, p):
+		try:
+			self.set_point(p)
+		except Exception as e:
+			self.exc = e
+
+	def set_wait(self):
+		if self.thr is not None:
+			self.thr.join()
+			self.thr = None
+		if self.exc is not None:
+			e = self.exc
+			self.exc = None
+			raise e
+		dt = self.te - time.time()
+		if dt > 0:
+			time.sleep(dt)
+
+	def done(self):
+		if self.checkpoint is None:
+			return 0
+		try:
+			return json.load(open(self.checkpoint))["done"]
+		except IOError:
+			return 0
+
+	def mark(self, n):
+		if self.checkpoint is None:
+			return
+		fo = open(self.checkpoint + ".tmp", "w")
+		json.dump({"done": n}, fo)
+		fo.close()
+		os.rename(self.checkpoint + ".tmp", self.checkpoint)
+
+	###############################################################
+	# The outermost axis changes after point i, or the sweep ends:
+	# a blank line goes in the data file, as gnuplot likes it.
+	def block_end(self, pl, i):
+		a = self.axes[0].name
+		return i + 1 == len(pl) or pl[i][a] != pl[i + 1][a]
+
+	###############################################################
+	# Cut the data file back to the first n points, dropping any
+	# line written after the last checkpoint by a crashed run.
+	def trim(self, pl, n):
+		if not os.path.exists(self.fname):
+			return
+		l = list()
+		k = 0
+		for i in open(self.fname):
+			if k == n:
+				break
+			l.append(i)
+			if i.strip() != "":
+				k += 1
+		if n > 0 and self.block_end(pl, n - 1):
+			l.append("\n")
+		fo = open(self.fname + ".tmp", "w")
+		fo.write("".join(l))
+		fo.close()
+		os.rename(self.fname + ".tmp", self.fname)
+
+	###############################################################
+	# Run the sweep, yielding (point, result) as they come in.
+	# Points completed before a crash are skipped.
+	def run(self):
+		pl = self.points()
+		n = self.done()
+		fo = None
+		if self.fname is not None and n == 0:
+			fo = open(self.fname, "w")
+		elif self.fname is not None:
+			self.trim(pl, n)
+			fo = open(self.fname, "a")
+		if n < len(pl):
+			self.set_point(pl[n])
+		for i in range(n, len(pl)):
+			p = pl[i]
+			self.set_wait()
+			x = self.measure()
+			if i + 1 < len(pl):
+				self.thr = threading.Thread(
+				    target=self.set_bg, args=(pl[i + 1],))
+				self.thr.start()
+			if self.fetch is not None:
+				x = self.fetch(x)
+			if fo is not None:
+				fo.write(self.format(p, x) + "\n")
+				if self.block_end(pl, i):
+					fo.write("\n")
+				fo.flush()
+			self.mark(i + 1)
+			yield p,x
+		self.set_wait()
+		if fo is not None:
+			fo.close()
+		# Complete, the next run starts over
+		if self.checkpoint is not None and \
+		    os.path.exists(self.checkpoint):
+			os.remove(self.checkpoint)
@@ -3,9 +3,10 @@
 import sys
 import time
 import prologix_usb
+import scpi
 import pcl_util
 
-class tds540a(prologix_usb.gpib_dev):
+class tds540a(scpi.scpi, prologix_usb.gpib_dev):
 
 	def __init__(self, name = "gpib0", adr = 1):
 		prologix_usb.gpib_dev.__init__(self, name, adr)
@@ -13,9 +14,7 @@ class tds540a(prologix_usb.gpib_dev):
 		self.attr("rd_mode", 10)
 		self.attr("autocr", 1)
 		self.errors()
-		x = self.ask("*IDN?").split(",")
-		if x[0] != "TEKTRONIX" or x[1] != "TDS 540A":
-			self.fail("TDS540A ID Failure (%s)" % x)
+		self.idn_check("TEKTRONIX", "TDS 540A")
 		self.id = "TDS540A"
 		self.AOK()
 
@@ -23,6 +22,7 @@ class tds540a(prologix_usb.gpib_dev):
 	# PYLT Standard methods
 	#######################
 
+	# Not SYST:ERR? on this one
 	def errors(self, f=sys.stderr):
 		r = False
 		while int(self.ask("*ESR?")) & 0x20:
@@ -33,21 +33,15 @@ class tds540a(prologix_usb.gpib_dev):
 			r = True
 		return r
 
-	def reset(self):
-		self.wr("*RST");
-		self.AOK()
-
 	def screen_dump(self, fname = "_.tds540a.pbm"):
 		print(self.id + " Taking a screendump into " + fname)
 		self.AOK()
-		self.wr("HARDCOPY abort")
-		self.AOK()
-		self.wr("CLEARMenu")
-		self.AOK()
-		self.wr("HARDCOPY:FORMAT THINKJET")
-		self.wr("HARDCOPY:LAYOUT PORTRAIT")
-		self.wr("HARDCOPY:PORT GPIB")
-		self.AOK()
+		with self.batch():
+			self.wr("HARDCOPY abort")
+			self.wr("CLEARMenu")
+			self.wr("HARDCOPY:FORMAT THINKJET")
+			self.wr("HARDCOPY:LAYOUT PORTRAIT")
+			self.wr("HARDCOPY:PORT GPIB")
 		self.wr("HARDCOPY start")
 		x = ""
 		while True:
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+#
+# Accumulate spectrum analyzer traces over many frames
+#
+# Keeps, in fixed memory however many frames are added:
+#
+#	average		mean of all frames, or exponential over the
+#			last n frames if n is given
+#	max_hold	largest value seen at each point
+#	min_hold	smallest value seen at each point
+#	waterfall	the last "depth" frames, oldest first
+#
+# NaN points (blanked, see hp8568b.graph_blocks()) are left out of
+# the average and holds.  Averaging is done on the values as given,
+# in display units or dB that is video averaging, as on the analyzer.
+#
+# Usage is:
+#	d = hp8568b.hp8568b()
+#	a = trace_accum.accum(depth=1000)
+#	for i in range(10000):
+#		a.add(d.screen_trace())
+#	plot(a.max_hold)
+#
+
+from __future__ import print_function
+
+import numpy
+
+class accum(object):
+
+	def __init__(self, depth=256, n=None):
+		self.depth = depth
+		self.n = n
+		self.npts = None
+
+	def reset(self, npts):
+		self.npts = npts
+		self.frames = 0
+		self.sum = numpy.zeros(npts)
+		self.cnt = numpy.zeros(npts)
+		self.average = numpy.full(npts, numpy.nan)
+		self.max_hold = numpy.full(npts, numpy.nan)
+		self.min_hold = numpy.full(npts, numpy.nan)
+		self.ring = numpy.full((self.depth, npts), numpy.nan,
+		    dtype=numpy.float32)
+		self.next = 0
+
+	def add(self, y):
+		y = numpy.asarray(y, dtype=numpy.float64)
+		if self.npts != len(y):
+			self.reset(len(y))
+		self.frames += 1
+		ok = ~numpy.isnan(y)
+		if self.n is None:
+			self.sum[ok] += y[ok]
+			self.cnt[ok] += 1
+			with numpy.errstate(invalid="ignore", divide="ignore"):
+				self.average = self.sum / self.cnt
+		else:
+			self.cnt[ok] += 1
+			new = ok & numpy.isnan(self.average)
+			self.average[new] = y[new]
+			k = numpy.minimum(self.cnt, self.n)
+			upd = ok & ~new
+			self.average[upd] += (y[upd] - self.average[upd]) / k[upd]
+		self.max_hold = numpy.fmax(self.max_hold, y)
+		self.min_hold = numpy.fmin(self.min_hold, y)
+		if self.depth > 0:
+			self.ring[self.next] = y
+			self.next = (self.next + 1) % self.depth
+
+	###############################################################
+	# The last frames, oldest first, one per row
+	def waterfall(self):
+		n = min(self.frames, self.depth)
+		if n < self.depth:
+			return self.ring[:n]
+		return numpy.concatenate(
+		    (self.ring[self.next:], self.ring[:self.next]))
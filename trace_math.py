@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+#
+# Host side trace math, for data read from network analyzers such as
+# the HP3577A.
+#
+# Traces are numpy arrays, complex for the inputs and registers,
+# with the points along the last axis, so a stack of sweeps (one per
+# row) is handled in one go.
+#
+# User defined functions use the 3577A syntax (UF1-5):
+#
+#	R, A, B		inputs
+#	D1 ... D4	storage registers
+#	K1 ... K4	constants
+#	F1 ... F5	other user defined functions
+#	+ - * / ( )
+#
+# Usage is:
+#	f = trace_math.function("(A/R)/D1")
+#	x = f(A=a, R=r, D1=d1)
+#	db = trace_math.db(trace_math.average(x))
+#
+
+from __future__ import print_function
+
+import re
+
+import numpy
+
+###############################################################
+# User defined functions
+
+tokens = re.compile(r"\s*(?:(R|A|B|D[1-4]|K[1-4]|F[1-5])|([-+*/()]))")
+
+###############################################################
+# Compile a 3577A user defined function into a python function,
+# which takes the terms as keyword arguments.  Other functions are
+# given as "funcs", a dict of {"F1": function(...), ...}.
+def function(expr, funcs=None):
+	l = list()
+	names = set()
+	i = 0
+	expr = expr.strip().upper()
+	while i < len(expr):
+		m = tokens.match(expr, i)
+		if m is None:
+			raise ValueError("Bad user function at '%s'" % expr[i:])
+		if m.group(1) is not None:
+			names.add(m.group(1))
+			l.append("t['%s']" % m.group(1))
+		else:
+			l.append(m.group(2))
+		i = m.end()
+	try:
+		code = compile(" ".join(l), expr, "eval")
+	except SyntaxError:
+		raise ValueError("Bad user function '%s'" % expr)
+	if funcs is None:
+		funcs = dict()
+
+	def f(**kw):
+		t = dict()
+		for n in names:
+			if n[0] == "F":
+				t[n] = funcs[n](**kw)
+			elif n not in kw:
+				raise ValueError("%s needs %s" % (expr, n))
+			else:
+				t[n] = numpy.asarray(kw[n])
+		return eval(code, {"__builtins__": {}}, {"t": t})
+	f.names = names
+	return f
+
+###############################################################
+# Compile the user defined functions of an instrument, given as
+# {"F1": "A/R", "F2": "F1*K1", ...}.  They may refer to each other,
+# but not in circles.
+def functions(defs):
+	funcs = dict()
+	for n,e in defs.items():
+		funcs[n.upper()] = function(e, funcs)
+	return funcs
+
+###############################################################
+# Display conversions
+
+def db(x):
+	return 20 * numpy.log10(numpy.abs(x))
+
+def phase(x, unwrap=False, deg=True):
+	p = numpy.angle(x)
+	if unwrap:
+		p = numpy.unwrap(p, axis=-1)
+	if deg:
+		p = numpy.degrees(p)
+	return p
+
+###############################################################
+# Normalise to a reference trace (the NRM key), x and ref complex.
+def normalise(x, ref):
+	return numpy.asarray(x) / numpy.asarray(ref)
+
+###############################################################
+# Aperture, as fraction of the span, in points, at least one each
+# side.  The 3577A apertures (AP1-6) are .005, .01, ... .16
+def aperture_points(npts, aperture):
+	return max(1, int(round(aperture * (npts - 1) / 2.)))
+
+###############################################################
+# Moving average over the aperture, along the points.
+# The window shrinks at the ends, as on the instrument.
+def smooth(x, aperture=.01):
+	x = numpy.asarray(x)
+	n = x.shape[-1]
+	k = aperture_points(n, aperture)
+	c = numpy.cumsum(x, axis=-1)
+	z = numpy.zeros(x.shape[:-1] + (1,), dtype=c.dtype)
+	c = numpy.concatenate((z, c), axis=-1)
+	i = numpy.arange(n)
+	lo = numpy.maximum(i - k, 0)
+	hi = numpy.minimum(i + k + 1, n)
+	return (c[..., hi] - c[..., lo]) / (hi - lo)
+
+###############################################################
+# Group delay in seconds, from complex data or phase (radians) over
+# the frequencies f (Hz), differentiated across the aperture.
+def group_delay(x, f, aperture=.01):
+	x = numpy.asarray(x)
+	if numpy.iscomplexobj(x):
+		p = numpy.unwrap(numpy.angle(x), axis=-1)
+	else:
+		p = numpy.unwrap(x, axis=-1)
+	f = numpy.asarray(f, dtype=numpy.float64)
+	n = p.shape[-1]
+	k = aperture_points(n, aperture)
+	i = numpy.arange(n)
+	lo = numpy.maximum(i - k, 0)
+	hi = numpy.minimum(i + k, n - 1)
+	return -(p[..., hi] - p[..., lo]) / (2 * numpy.pi * (f[hi] - f[lo]))
+
+###############################################################
+# Average a stack of sweeps (one per row).  Complex data is averaged
+# as vectors, like the instrument does, so noise averages down
+# instead of adding up in the magnitude.
+def average(x, axis=0):
+	return numpy.mean(numpy.asarray(x), axis=axis)
+
+###############################################################
+# Running average of sweeps as they come in, exponential once n
+# sweeps have been seen, like the 3577A AV1-7.
+class averager(object):
+
+	def __init__(self, n=16):
+		self.n = n
+		self.count = 0
+		self.avg = None
+
+	def add(self, x):
+		x = numpy.asarray(x)
+		self.count += 1
+		if self.avg is None:
+			self.avg = x.astype(numpy.result_type(x, numpy.float64))
+		else:
+			self.avg += (x - self.avg) / min(self.count, self.n)
+		return self.avg
@@ -1,20 +1,38 @@
 #!/usr/local/bin/python
 
 import usb488
+import scpi
 import sys
 import time
+import bus_engine
+
+man = "Agilent Technologies"
+prod = "USB POWER SENSOR"
+
+###############################################################
+# Serial numbers of all the connected sensors
+def find_all():
+	return usb488.usbtmc_findall(man, prod)
+
+class u2004a(scpi.scpi, usb488.usb488):
+
+	commands = {
+		"freq": "FREQ %.0fHz",
+		"conf": "CONF %g,%d",
+	}
 
-class u2004a(usb488.usb488):
 	def __init__(self, serial = None):
-		self.debug_fd = open("_.u2004a", "w")
-		usb488.usb488.__init__(self,
-		    "Agilent Technologies", "USB POWER SENSOR", serial)
+		if serial is None:
+			self.debug_fd = open("_.u2004a", "w")
+		else:
+			self.debug_fd = open("_.u2004a." + serial, "w")
+		usb488.usb488.__init__(self, man, prod, serial)
 
 		self.usbdev.default_timeout=7000
 		self.spoll_data = 0x20
+		self.spoll_err = 0x04
 		self.reset()
-		x = self.ask("*IDN?").split(',')
-		self.id = x[1]
+		self.idn_check(None, "U2004A")
 		self.AOK()
 
 	def reset(self):
@@ -32,39 +50,37 @@ class u2004a(usb488.usb488):
 		self.spoll()
 		self.debug("RESET end")
 
-	def errors(self, f=sys.stderr):
-		r = False
-		while True:
-			x = self.ask("SYST:ERR?")
-			if x == '+0,"No error"':
-				break
-			f.write(self.id + ".ERROR: (" +  x + ")\n")
-			r = True
-		return r
-
 	def config(self, freq=None, level=None, resolution=1):
-		if freq != None:
-			self.wr("FREQ %.0fHz" % freq)
-			self.AOK()
 		self.ask("*ESR?")
 		if level == None:
 			level = 20
-		self.wr("CONF %g,%d" % (level, resolution))
-		self.AOK()
+		with self.batch():
+			if freq != None:
+				self.cmd("freq", freq)
+			self.cmd("conf", level, resolution)
 
-	def measure(self, tmo=70000, fail=True):
+	###############################################################
+	# A measurement is split in three, so the result can be read back
+	# while something else happens (see sweep.py):
+	#	trigger()	start it
+	#	wait_done()	return when it is complete
+	#	fetch()		read the result back
+	def trigger(self):
 		self.debug("measure() begin")
 		self.AOK()
 		self.spoll()
-		t = time.time()
+		self.t_trig = time.time()
 
 		self.wr("INIT:IMM")
 		self.wr("*OPC")
 		# This delay is important, USB bus hangs without it
 		time.sleep(0.100)
 
+	def wait_done(self, tmo=70000):
 		self.wait_spoll(0x20,tmo)
-		self.debug("T %.3f" % (time.time() - t))
+		self.debug("T %.3f" % (time.time() - self.t_trig))
+
+	def fetch(self, fail=True):
 		self.spoll()
 		x = self.ask("FETCH?", tmo=2000, fail=fail)
 		self.ask("*ESR?")
@@ -78,6 +94,82 @@ class u2004a(usb488.usb488):
 			return (True, float(x[1]))
 		return float(x)
 
+	def measure(self, tmo=70000, fail=True):
+		self.trigger()
+		self.wait_done(tmo)
+		return self.fetch(fail)
+
+	###############################################################
+	# Stream readings at the sensors own pace.
+	#
+	# Each reading is one compound INIT:IMM;*OPC, a wait for the
+	# operation complete bit (0x20), which comes in over the
+	# interrupt endpoint, and one compound FETCH?;*ESR?, which also
+	# clears that bit for the next reading.  So every reading is a
+	# new measurement, and there is none of the per-reading error
+	# checking of measure().  Errors are only checked every "check"
+	# readings, and then only if the error-queue bit (0x04) shows in
+	# spoll().
+	#
+	# "delay" is the pause after INIT which measure() found the USB
+	# bus needs, set it to zero if your sensor does without.
+	#
+	# Stop after "count" readings, or when the caller stops asking.
+	#
+	def stream(self, count=None, check=100, tmo=70000, delay=0.100):
+		self.debug("stream() begin")
+		self.ask("*ESR?")
+		self.AOK()
+		self.wr("TRIG:SOURCE IMM")
+		n = 0
+		try:
+			while count is None or n < count:
+				self.wr("INIT:IMM;*OPC")
+				if delay > 0:
+					time.sleep(delay)
+				self.wait_data(tmo)
+				x = self.ask_many(["FETCH?", "*ESR?"], tmo=2000)
+				n += 1
+				if n % check == 0 and self.spoll() & 0x04:
+					self.AOK()
+				yield float(x[0])
+		finally:
+			self.wr("TRIG:SOURCE HOLD")
+			self.spoll()
+			self.AOK()
+			self.debug("stream() end after %d readings" % n)
+
+###############################################################
+# A bank of sensors measuring at the same time.
+#
+# Each sensor is its own USB bus as far as bus_engine is concerned,
+# so they are triggered and waited for in parallel, and a round of
+# measurements takes as long as the slowest sensor.
+#
+class u2004a_group(object):
+	def __init__(self, serials = None):
+		if serials is None:
+			serials = find_all()
+		self.engine = bus_engine.engine()
+		self.sensors = list()
+		for i in serials:
+			self.sensors.append(u2004a(i))
+
+	def config(self, freq=None, level=None, resolution=1):
+		for d in self.sensors:
+			self.engine.submit(d, d.config, freq, level, resolution)
+		self.engine.join()
+
+	###############################################################
+	# Returns a dict of {serial number: reading}
+	def measure(self, tmo=70000, fail=True):
+		for d in self.sensors:
+			self.engine.submit(d, d.measure, tmo, fail)
+		r = dict()
+		for d,x in zip(self.sensors, self.engine.join()):
+			r[d.SerialNumber] = x
+		return r
+
 if __name__ == "__main__":
 	d = u2004a()
 	print("Device reponds: " + d.ask("*IDN?"))
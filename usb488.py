@@ -62,6 +62,17 @@ class usbtmc_usbfind(object):
 					return
 			return (cfg, intf)
 
+#################################################################################################################################
+# Find the serial numbers of all the matching USBTMC devices, for opening
+# a bank of identical instruments one by one.
+#
+def usbtmc_findall(man=None, prod=None, proto=1):
+	match = usbtmc_usbfind(man, prod, None, proto)
+	l = list()
+	for dev in usb.core.find(find_all=True, custom_match=match):
+		l.append(usb.util.get_string(dev, 100, dev.iSerialNumber))
+	return l
+
 #################################################################################################################################
 #
 # USBTMC class
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+#
+# Waterfall (spectrogram) capture with incrementally rendered tiles
+#
+# Each trace appended becomes a row of a memory-mapped 2-D array, and
+# every "tile" rows are rendered to a PNG as soon as they are complete,
+# so nothing is ever rendered twice.
+#
+# For browsing long captures there is a level-of-detail pyramid: level
+# k has one row per 2**k traces (the max of them, so short signals
+# stay visible), stored and tiled the same way as level 0.  A day of
+# captures can be looked at as a handful of tiles at a high level,
+# and zoomed into without reading the traces again.
+#
+# The directory holds:
+#
+#	meta.json		points per row, tile height, color scale,
+#				rows per level
+#	t.f8			timestamp of each trace
+#	L<k>.f4			level k rows, float32
+#	L<k>/<n>.png		level k, rows n*tile ... (n+1)*tile-1
+#
+# As in readings_store, meta.json is saved last and its row counts
+# are what counts, rows are written at those counts, so whatever a
+# crash left beyond them is overwritten.
+#
+# Usage is:
+#	d = hp8568b.hp8568b()
+#	w = waterfall.waterfall("_.wf", 1001, lo=0, hi=1023)
+#	while True:
+#		w.append(d.screen_trace())
+#
+
+from __future__ import print_function
+
+import json
+import os
+import struct
+import time
+import zlib
+
+import numpy
+
+import readings_store
+
+###############################################################
+# Minimal PNG writer, 8 bit palette images
+
+def png_chunk(t, b):
+	c = struct.pack(">I", len(b)) + t + b
+	return c + struct.pack(">I", zlib.crc32(t + b) & 0xffffffff)
+
+def png(fname, img, palette):
+	h,w = img.shape
+	raw = numpy.zeros((h, w + 1), dtype=numpy.uint8)
+	raw[:, 1:] = img
+	s = b"\x89PNG\r\n\x1a\n"
+	s += png_chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 3, 0, 0, 0))
+	s += png_chunk(b"PLTE", palette.astype(numpy.uint8).tobytes())
+	s += png_chunk(b"IDAT", zlib.compress(raw.tobytes(), 6))
+	s += png_chunk(b"IEND", b"")
+	fo = open(fname + ".tmp", "wb")
+	fo.write(s)
+	fo.close()
+	os.rename(fname + ".tmp", fname)
+
+###############################################################
+# Black - blue - red - white, index 0 is black for no data
+def heat():
+	x = numpy.linspace(0, 1, 256)
+	r = numpy.clip(3 * x - 1, 0, 1)
+	g = numpy.clip(3 * x - 2, 0, 1)
+	b = numpy.where(x < 1/3., 3 * x, numpy.where(x < 2/3., 2 - 3 * x,
+	    3 * x - 2))
+	p = numpy.column_stack((r, g, b)) * 255
+	p[0] = 0
+	return p
+
+class waterfall(object):
+
+	###############################################################
+	# Open a capture, creating it if need be.  lo and hi are the
+	# values mapped to the ends of the color scale.
+	def __init__(self, dirname, npts=None, tile=256, lo=0., hi=1023.,
+	    levels=12):
+		self.dirname = dirname
+		self.fmeta = os.path.join(dirname, "meta.json")
+		if os.path.exists(self.fmeta):
+			self.h = json.load(open(self.fmeta))
+		else:
+			assert npts is not None
+			if not os.path.isdir(dirname):
+				os.makedirs(dirname)
+			self.h = {
+				"npts": npts,
+				"tile": tile,
+				"lo": lo,
+				"hi": hi,
+				"rows": [0] * levels,
+			}
+			self.save()
+		self.npts = self.h["npts"]
+		self.tile = self.h["tile"]
+		self.palette = heat()
+
+	def save(self):
+		fo = open(self.fmeta + ".tmp", "w")
+		json.dump(self.h, fo, indent=1)
+		fo.close()
+		os.rename(self.fmeta + ".tmp", self.fmeta)
+
+	def fname(self, level):
+		return os.path.join(self.dirname, "L%d.f4" % level)
+
+	def tile_name(self, level, n):
+		return os.path.join(self.dirname, "L%d" % level, "%d.png" % n)
+
+	def __len__(self):
+		return self.h["rows"][0]
+
+	###############################################################
+	# Rows of a level, as a memory-mapped array
+	def data(self, level=0):
+		n = self.h["rows"][level]
+		if n == 0:
+			return numpy.zeros((0, self.npts), dtype=numpy.float32)
+		return numpy.memmap(self.fname(level), dtype="<f4", mode="r",
+		    shape=(n, self.npts))
+
+	def times(self):
+		n = self.h["rows"][0]
+		if n == 0:
+			return numpy.zeros(0)
+		return numpy.memmap(os.path.join(self.dirname, "t.f8"),
+		    dtype="<f8", mode="r", shape=(n,))
+
+	def put(self, level, y):
+		readings_store.write_rows(self.fname(level),
+		    self.h["rows"][level], y.astype("<f4").reshape(1, -1))
+		self.h["rows"][level] += 1
+		n = self.h["rows"][level]
+		if n % self.tile == 0:
+			self.render(level, n // self.tile - 1)
+		# Every second row, the max of the pair goes a level up
+		if n % 2 == 0 and level + 1 < len(self.h["rows"]):
+			p = self.data(level)[n - 2:n]
+			self.put(level + 1, numpy.fmax(p[0], p[1]))
+
+	###############################################################
+	# Add a trace, t defaults to now
+	def append(self, y, t=None):
+		y = numpy.asarray(y, dtype=numpy.float32)
+		assert len(y) == self.npts
+		if t is None:
+			t = time.time()
+		readings_store.write_rows(os.path.join(self.dirname, "t.f8"),
+		    self.h["rows"][0], numpy.array([t], dtype="<f8"))
+		self.put(0, y)
+		self.save()
+
+	def colors(self, a):
+		lo = self.h["lo"]
+		hi = self.h["hi"]
+		x = (numpy.asarray(a, dtype=numpy.float64) - lo) / (hi - lo)
+		i = numpy.clip(x * 254 + 1, 1, 255)
+		i[numpy.isnan(x)] = 0
+		return i.astype(numpy.uint8)
+
+	###############################################################
+	# Render a tile, newest row at the bottom
+	def render(self, level, n):
+		d = os.path.join(self.dirname, "L%d" % level)
+		if not os.path.isdir(d):
+			os.makedirs(d)
+		a = self.data(level)[n * self.tile:(n + 1) * self.tile]
+		png(self.tile_name(level, n), self.colors(a), self.palette)
+
+	###############################################################
+	# The lowest level at which rows r0...r1 (level 0 rows) fit in
+	# about "height" pixels, and the tiles covering them there.
+	def view(self, r0, r1, height=1000):
+		level = 0
+		while level + 1 < len(self.h["rows"]) and \
+		    (r1 - r0) >> level > height:
+			level += 1
+		rows = self.tile << level
+		n = self.h["rows"][level] // self.tile
+		l = list()
+		for i in range(r0 // rows, min(n, (r1 + rows - 1) // rows)):
+			l.append(self.tile_name(level, i))
+		return level, l